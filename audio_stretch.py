@@ -0,0 +1,78 @@
+﻿"""
+Audio Stretch - Pitch-preserving time-stretching (WSOLA) for TTS playback
+"""
+
+import numpy as np
+
+
+def _hann(length):
+    """Periodic Hann window (sums to 1 at 50% overlap)"""
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)
+
+
+def _best_offset(mono, template, lo, hi):
+    """Find the start in [lo, hi] whose segment best matches template (normalised cross-correlation)"""
+    length = len(template)
+    region = mono[lo:hi + length]
+    corr = np.correlate(region, template, mode='valid')
+
+    energy = np.cumsum(np.concatenate(([0.0], region * region)))
+    energy = energy[length:] - energy[:-length]
+
+    return lo + int(np.argmax(corr / np.sqrt(energy + 1e-9)))
+
+
+def time_stretch(samples, sample_rate, speed, frame_ms=40, tolerance_ms=12):
+    """Speed audio up (speed > 1) or slow it down (speed < 1) without changing pitch
+
+    samples is a float array shaped (n,) or (n, channels). Uses WSOLA: frames are
+    taken from the input at speed * hop, each nudged within the tolerance to line
+    up with the previous frame's natural continuation, then overlap-added at hop.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if speed == 1.0 or len(samples) == 0:
+        return samples
+
+    mono = samples if samples.ndim == 1 else samples.mean(axis=1)
+
+    frame = max(2, int(sample_rate * frame_ms / 1000) // 2 * 2)
+    hop_out = frame // 2
+    hop_in = hop_out * speed
+    tolerance = int(sample_rate * tolerance_ms / 1000)
+
+    last_start = len(mono) - frame
+    if last_start <= 0:
+        return samples
+
+    n_frames = int(last_start / hop_in) + 1
+
+    # Frame placement is sequential (each depends on the previous choice); the
+    # search within each step is a single vectorised correlation
+    starts = np.zeros(n_frames, dtype=np.int64)
+    for k in range(1, n_frames):
+        natural = min(starts[k - 1] + hop_out, last_start)
+        nominal = int(k * hop_in)
+        lo = max(0, nominal - tolerance)
+        hi = min(last_start, nominal + tolerance)
+        if hi <= lo:
+            starts[k] = min(nominal, last_start)
+            continue
+        starts[k] = _best_offset(mono, mono[natural:natural + hop_out], lo, hi)
+
+    window = _hann(frame).astype(np.float32)
+    offsets = np.arange(frame)
+    read_idx = starts[:, None] + offsets
+    write_idx = (np.arange(n_frames) * hop_out)[:, None] + offsets
+    out_len = (n_frames - 1) * hop_out + frame
+
+    norm = np.bincount(write_idx.ravel(), weights=np.tile(window, n_frames), minlength=out_len)
+    norm[norm < 1e-3] = 1.0
+
+    def overlap_add(channel):
+        frames = channel[read_idx] * window
+        return np.bincount(write_idx.ravel(), weights=frames.ravel(), minlength=out_len) / norm
+
+    if samples.ndim == 1:
+        return overlap_add(samples).astype(np.float32)
+
+    return np.stack([overlap_add(samples[:, c]) for c in range(samples.shape[1])], axis=1).astype(np.float32)
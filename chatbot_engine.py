@@ -2,10 +2,14 @@
 import threading
 import time
 from pathlib import Path
-from collections import deque
+from collections import deque, Counter
 from llm_manager import LLMManager
-from tts_manager import TTSManager
-from input_handlers import InputManager
+from tts_manager import TTSManager, PAID_PROVIDERS
+from input_handlers import InputManager, WakeWordSpotter
+from load_controller import LoadController
+from response_cache import ResponseCache
+from screen_watcher import ScreenWatcher
+from echo_control import EchoSuppressor
 from avatar_window import AvatarWindow
 import os
 from dotenv import load_dotenv
@@ -15,6 +19,13 @@ env_file = Path('.env')
 if env_file.exists():
     load_dotenv(env_file)
 
+AUDIO_SENSITIVITY_TEST_TEXT = (
+    "Testing audio sensitivity. "
+    "Watch the audio meter and avatar. "
+    "The mouth should open when volume is above the threshold. "
+    "Try adjusting the sensitivity slider if needed."
+)
+
 
 class ChatbotEngine:
     def __init__(self, config_file='chatbot_config.json'):
@@ -34,12 +45,20 @@ class ChatbotEngine:
         self.twitch_thread = None
         self.twitch_running = False
         self.last_twitch_response_time = 0
-        self.current_twitch_username = None
-        self.current_twitch_message = None
+
+        # Accepted chat messages waiting to be answered together in digest mode
+        self.digest_buffer = deque()
+
+        # Idle-time cache pre-warming of fallback lines and frequent chatters' names
+        self.prewarm_thread = None
+        self.prewarm_failed = set()
+        self.chatter_counts = Counter()
 
         self.avatar_window = None
 
         self.on_response_callback = None
+        self.on_user_speech = None
+        self.on_status = None
         self.on_speaking_start = None
         self.on_speaking_end = None
         self.on_volume_update = None
@@ -49,6 +68,22 @@ class ChatbotEngine:
         self.tts_processing = False
         self.tts_lock = threading.Lock()
 
+        # Work dropped because its deadline passed, per pipeline stage
+        self.expired_counts = {'llm': 0, 'synthesis': 0, 'playback': 0}
+        self.stats_lock = threading.Lock()
+
+        # Measures chat activity and backlog to adapt reply length and cooldown
+        self.load = LoadController()
+
+        # Replies to repeated chat questions (created in initialize() when enabled)
+        self.response_cache = None
+
+        # Reacts to scene changes on screen when screen_watch_enabled is set
+        self.screen_watcher = None
+
+        # Hands-free listening (VAD-endpointed turns without push-to-talk)
+        self.hands_free_stop = None
+
     def load_config(self):
         """Load configuration"""
         if self.config_file.exists():
@@ -64,7 +99,17 @@ class ChatbotEngine:
             'user_name': 'User',
             'personality': 'You are a helpful AI assistant.',
             'llm_model': 'gpt-4o',
+            'llm_endpoints': [],
+            'llm_fallback_model': '',
+            'llm_request_timeout': 30,
+            'llm_hedge_after': 0,
+            'llm_routing_enabled': False,
+            'llm_routing_models': [],
+            'llm_routing_long_words': 40,
             'tts_service': 'streamelements',
+            'tts_failover_chain': [],
+            'tts_fallback_voices': {},
+            'tts_hedge_requests': False,
             'elevenlabs_voice': 'Brian',
             'twitch_enabled': False,
             'twitch_channel': '',
@@ -78,8 +123,45 @@ class ChatbotEngine:
             'twitch_speak_username': True,
             'twitch_speak_message': True,
             'twitch_strip_emojis': True,
+            'twitch_reply_expiry': 45,
+            'twitch_digest_enabled': False,
+            'twitch_digest_window': 3,
+            'twitch_digest_max': 5,
+            'voice_reply_expiry': 0,
+            'text_reply_expiry': 0,
             'mic_enabled': True,
+            'mic_preroll': 0.5,
+            'stt_backend': 'google',
+            'hands_free_enabled': False,
+            'vad_aggressiveness': 2,
+            'vad_hangover': 0.5,
+            'wake_word_enabled': False,
+            'wake_word': '',
+            'wake_word_timeout': 8,
+            'echo_suppression': 'gate',
+            'echo_tail': 0.3,
+            'echo_delay': 0.1,
+            'vosk_model_path': 'models/vosk-model-small-en-us-0.15',
             'screen_enabled': False,
+            'screenshot_max_size': 1024,
+            'screenshot_format': 'jpeg',
+            'screenshot_quality': 70,
+            'vision_detail': 'auto',
+            'vision_history_mode': 'description',
+            'vision_image_store_mb': 20,
+            'screen_reuse_threshold': 0.005,
+            'screen_reuse_max_age': 60,
+            'screen_ocr_enabled': False,
+            'screen_ocr_min_confidence': 75,
+            'screen_ocr_min_words': 8,
+            'screen_ocr_model': '',
+            'screen_watch_enabled': False,
+            'screen_watch_interval': 0.33,
+            'screen_watch_threshold': 0.12,
+            'screen_watch_min_gap': 60,
+            'screen_watch_max_per_hour': 20,
+            'screen_watch_prompt': "Something just changed on screen. React to what just happened in one short sentence.",
+            'screen_reply_expiry': 15,
             'hotkey_toggle': 'F4',
             'hotkey_stop': 'P',
             'hotkey_screenshot': 'F5',
@@ -95,7 +177,23 @@ class ChatbotEngine:
             'elevenlabs_speaker_boost': True,
             'response_length': 'normal',
             'max_response_tokens': 150,
-            'rate_limit_response': "I'm a bit overwhelmed right now, give me a moment!"
+            'adaptive_load': False,
+            'adaptive_min_tokens': 40,
+            'playback_speedup': False,
+            'max_playback_speed': 1.25,
+            'response_cache_enabled': False,
+            'response_cache_ttl': 600,
+            'response_cache_size': 500,
+            'response_cache_similarity': 0.8,
+            'response_cache_only_under_load': False,
+            'rate_limit_response': "I'm a bit overwhelmed right now, give me a moment!",
+            'no_answer_response': "Sorry, I lost my train of thought on that one.",
+            'llm_rate_limit_max_wait': 10,
+            'prewarm_enabled': True,
+            'prewarm_paid_providers': False,
+            'prewarm_phrases': [],
+            'prewarm_top_chatters': 20,
+            'prewarm_interval': 2
         }
 
     def save_config(self):
@@ -118,9 +216,49 @@ class ChatbotEngine:
 
         self.llm = LLMManager(
             model=self.config['llm_model'],
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            endpoints=self.config.get('llm_endpoints', [])
+        )
+        self.llm.rate_limiter.max_wait = self.config.get('llm_rate_limit_max_wait', 10)
+        self.llm.set_fallback(
+            fallback_model=self.config.get('llm_fallback_model', ''),
+            request_timeout=self.config.get('llm_request_timeout', 30),
+            hedge_after=self.config.get('llm_hedge_after', 0)
+        )
+        self.llm.set_routing(
+            enabled=self.config.get('llm_routing_enabled', False),
+            models=self.config.get('llm_routing_models', []),
+            long_prompt_words=self.config.get('llm_routing_long_words', 40)
+        )
+        self.llm.set_image_history(
+            mode=self.config.get('vision_history_mode', 'description'),
+            store_limit_mb=self.config.get('vision_image_store_mb', 20)
         )
 
+        self._report_status(self.inputs.set_stt_backend(
+            self.config.get('stt_backend', 'google'),
+            vosk_model_path=self.config.get('vosk_model_path', 'models/vosk-model-small-en-us-0.15')
+        ))
+
+        self.inputs.screen.configure(
+            max_size=self.config.get('screenshot_max_size', 1024),
+            image_format=self.config.get('screenshot_format', 'jpeg'),
+            quality=self.config.get('screenshot_quality', 70),
+            detail=self.config.get('vision_detail', 'auto'),
+            change_threshold=self.config.get('screen_reuse_threshold', 0.005),
+            ocr_enabled=self.config.get('screen_ocr_enabled', False),
+            description_max_age=self.config.get('screen_reuse_max_age', 60)
+        )
+
+        # Rebuilt with the LLM so a personality change doesn't serve old replies
+        self.response_cache = None
+        if self.config.get('response_cache_enabled', False):
+            self.response_cache = ResponseCache(
+                max_entries=self.config.get('response_cache_size', 500),
+                ttl=self.config.get('response_cache_ttl', 600),
+                similarity=self.config.get('response_cache_similarity', 0.8)
+            )
+
         elevenlabs_settings = {
             'stability': self.config.get('elevenlabs_stability', 0.5),
             'similarity_boost': self.config.get('elevenlabs_similarity', 0.75),
@@ -143,6 +281,12 @@ class ChatbotEngine:
 
         self.tts.set_volume_threshold(self.config.get('volume_threshold', 0.02))
 
+        self.tts.set_failover_chain(
+            self.config.get('tts_failover_chain', []),
+            fallback_voices=self.config.get('tts_fallback_voices', {}),
+            hedge_requests=self.config.get('tts_hedge_requests', False)
+        )
+
         if self.config.get('twitch_enabled', False) and self.config.get('twitch_channel'):
             channel = self.config['twitch_channel']
             oauth_token = os.getenv('TWITCH_OAUTH_TOKEN', '')
@@ -190,6 +334,46 @@ class ChatbotEngine:
         if self.config['twitch_enabled'] and self.inputs.twitch:
             self.start_twitch_polling()
 
+        if self.config.get('prewarm_enabled', True) and not (self.prewarm_thread and self.prewarm_thread.is_alive()):
+            self.prewarm_thread = threading.Thread(target=self._prewarm_loop, daemon=True)
+            self.prewarm_thread.start()
+
+        if self.config.get('mic_enabled', True):
+            self.inputs.start_mic_stream(preroll=self.config.get('mic_preroll', 0.5))
+
+            if self.config.get('hands_free_enabled', False) and not self.hands_free_stop:
+                self.hands_free_stop = threading.Event()
+                wake = self._wake_word_spotter()
+                if wake:
+                    self._report_status(wake.status)
+                listener = self.inputs.listen_continuous(
+                    self._on_hands_free_speech,
+                    self.hands_free_stop,
+                    vad_aggressiveness=self.config.get('vad_aggressiveness', 2),
+                    hangover=self.config.get('vad_hangover', 0.5),
+                    echo=EchoSuppressor(
+                        lambda: self.tts,
+                        mode=self.config.get('echo_suppression', 'gate'),
+                        tail=self.config.get('echo_tail', 0.3),
+                        delay=self.config.get('echo_delay', 0.1)
+                    ),
+                    wake=wake,
+                    wake_timeout=self.config.get('wake_word_timeout', 8)
+                )
+                if not listener:
+                    self.hands_free_stop = None
+                    self._report_status("Hands-free listening needs the microphone stream, which isn't open")
+
+        if self.config.get('screen_watch_enabled', False) and not self.screen_watcher:
+            self.screen_watcher = ScreenWatcher(
+                self._on_scene_change,
+                interval=self.config.get('screen_watch_interval', 0.33),
+                threshold=self.config.get('screen_watch_threshold', 0.12),
+                min_gap=self.config.get('screen_watch_min_gap', 60),
+                max_per_hour=self.config.get('screen_watch_max_per_hour', 20)
+            )
+            self.screen_watcher.start()
+
         if self.avatar_window:
             self._show_avatar('idle')
 
@@ -198,6 +382,16 @@ class ChatbotEngine:
         self.is_running = False
         self.stop_twitch_polling()
 
+        if self.screen_watcher:
+            self.screen_watcher.stop()
+            self.screen_watcher = None
+
+        if self.hands_free_stop:
+            self.hands_free_stop.set()
+            self.hands_free_stop = None
+
+        self.inputs.stop_mic_stream()
+
         if self.inputs.twitch:
             self.inputs.disable_twitch()
 
@@ -266,12 +460,15 @@ class ChatbotEngine:
             try:
                 messages = self.inputs.get_twitch_messages()
 
+                digest_mode = self.config.get('twitch_digest_enabled', False)
+
                 for msg in messages:
                     if not self.twitch_running:
                         break
 
                     username = msg['username']
                     message = msg['message']
+                    deadline = self.make_deadline('twitch', msg.get('received_at'))
 
                     # CHECK USERNAME BLACKLIST
                     blacklist = self.config.get('twitch_username_blacklist', [])
@@ -281,33 +478,142 @@ class ChatbotEngine:
                     should_respond = self._should_respond_to_twitch(message)
 
                     if should_respond:
-                        current_time = time.time()
-                        cooldown = self.config.get('twitch_cooldown', 5)
-
-                        if current_time - self.last_twitch_response_time >= cooldown:
-                            cleaned_message = self._strip_keyword_from_message(message)
-                            cleaned_message = self._strip_emojis(cleaned_message)
-                            cleaned_message = self._strip_custom_emotes(cleaned_message)
+                        if digest_mode:
+                            self._add_to_digest(username, self._clean_twitch_message(message),
+                                                msg.get('received_at'), deadline)
+                            continue
 
-                            self.current_twitch_username = username
-                            self.current_twitch_message = cleaned_message
-
-                            if self.config.get('twitch_read_username', True):
-                                user_input = f"{username} says: {cleaned_message}"
-                            else:
-                                user_input = cleaned_message
-
-                            self._process_and_respond(user_input)
+                        current_time = time.time()
 
-                            self.current_twitch_username = None
-                            self.current_twitch_message = None
+                        if current_time - self.last_twitch_response_time >= self._twitch_cooldown():
+                            self._respond_to_twitch(username, self._clean_twitch_message(message), deadline)
                             self.last_twitch_response_time = current_time
 
+                if digest_mode:
+                    self._flush_digest()
+
                 time.sleep(0.5)
 
             except Exception:
                 time.sleep(1)
 
+    def _twitch_cooldown(self):
+        """Get the current Twitch cooldown, adapted to load when enabled"""
+        cooldown = self.config.get('twitch_cooldown', 5)
+        if self.config.get('adaptive_load', False):
+            self._update_load()
+            cooldown = self.load.cooldown(cooldown)
+        return cooldown
+
+    def _clean_twitch_message(self, message):
+        """Strip keywords, emojis and blacklisted emotes from a chat message"""
+        cleaned_message = self._strip_keyword_from_message(message)
+        cleaned_message = self._strip_emojis(cleaned_message)
+        return self._strip_custom_emotes(cleaned_message)
+
+    def _respond_to_twitch(self, username, cleaned_message, deadline=None):
+        """Respond to a single Twitch chat message"""
+        self.chatter_counts[username] += 1
+        self.load.record_ingest()
+
+        # Queue the read-back first so it plays while the LLM is still generating
+        readback_entry = None
+        prefix, readback = self._twitch_readback(username, cleaned_message)
+        if prefix or readback:
+            readback_entry = self._queue_speech(readback, deadline, kind='readback', prefix=prefix)
+
+        if self.config.get('twitch_read_username', True):
+            user_input = f"{username} says: {cleaned_message}"
+        else:
+            user_input = cleaned_message
+
+        answered = self._process_and_respond(user_input, deadline=deadline, cache_key=cleaned_message,
+                                             cache_user=username)
+
+        # Don't leave a question read out with no answer: withdraw the read-back if it
+        # hasn't played yet, otherwise follow it with a short fallback line
+        if readback_entry and not answered and self.is_running and not self._unqueue_speech(readback_entry):
+            self._queue_speech(self.config.get('no_answer_response',
+                                               "Sorry, I lost my train of thought on that one."))
+
+    def _twitch_readback(self, username, cleaned_message):
+        """Build the spoken read-back of a chat message from the speak settings
+
+        Returns (prefix, message). The prefix ("alice said") is synthesized once per
+        chatter and cached by the TTS manager; only the message is synthesized each time.
+        """
+        speak_username = self.config.get('twitch_speak_username', True) and username
+        speak_message = self.config.get('twitch_speak_message', True) and cleaned_message
+
+        if speak_username and speak_message:
+            return f"{username} said", cleaned_message
+        if speak_username:
+            return username, ''
+        if speak_message:
+            return None, cleaned_message
+        return None, ''
+
+    def _add_to_digest(self, username, cleaned_message, received_at=None, deadline=None):
+        """Hold an accepted chat message until the digest window closes"""
+        if not cleaned_message:
+            return
+
+        self.load.record_ingest()
+        self.digest_buffer.append({
+            'username': username,
+            'message': cleaned_message,
+            'received_at': received_at or time.time(),
+            'deadline': deadline
+        })
+
+        # Keep the most recent messages when chat outpaces the digest size
+        max_messages = self.config.get('twitch_digest_max', 5)
+        while len(self.digest_buffer) > max_messages:
+            self.digest_buffer.popleft()
+
+    def _flush_digest(self):
+        """Answer the buffered chat messages once the window and cooldown have passed"""
+        if not self.digest_buffer:
+            return
+
+        current_time = time.time()
+        window = self.config.get('twitch_digest_window', 3)
+
+        if current_time - self.digest_buffer[0]['received_at'] < window:
+            return
+        if current_time - self.last_twitch_response_time < self._twitch_cooldown():
+            return
+
+        batch = [item for item in self.digest_buffer if not self._is_expired(item['deadline'], 'llm')]
+        self.digest_buffer.clear()
+
+        if len(batch) == 1:
+            self._respond_to_twitch(batch[0]['username'], batch[0]['message'], batch[0]['deadline'])
+        elif batch:
+            self._respond_to_digest(batch)
+        else:
+            return
+
+        self.last_twitch_response_time = current_time
+
+    def _respond_to_digest(self, batch):
+        """Answer several chat messages with one LLM call"""
+        lines = [f"{item['username']}: {item['message']}" for item in batch]
+        user_input = (
+            "Several chat messages came in at once. Reply to all of them together in one "
+            "response, addressing people by name where it fits:\n" + "\n".join(lines)
+        )
+
+        # History keeps just the messages, shortened, instead of the full prompt
+        history_input = "[chat] " + " | ".join(
+            f"{item['username']}: {item['message'][:100]}" for item in batch
+        )
+
+        deadlines = [item['deadline'] for item in batch if item['deadline'] is not None]
+        deadline = min(deadlines) if deadlines else None
+
+        self._process_and_respond(user_input, deadline=deadline, history_input=history_input)
+
     def _should_respond_to_twitch(self, message):
         """Check if should respond to Twitch message"""
         import random
@@ -435,22 +741,132 @@ class ChatbotEngine:
         user_text = self.inputs.listen_microphone(timeout=10)
 
         if user_text:
-            screen_data = None
-            if self.inputs.enabled_inputs['screen']:
-                screen_data = self.inputs.capture_screen()
+            self.process_voice_text(user_text)
+
+    def process_voice_text(self, user_text):
+        """Answer transcribed speech, with a screenshot if screen input is on"""
+        deadline = self.make_deadline('voice')
+
+        screen_data = None
+        if self.inputs.enabled_inputs['screen']:
+            screen_data = self.inputs.capture_screen()
 
-            self._process_and_respond(user_text, screen_data)
+        self._process_and_respond(user_text, screen_data, deadline=deadline)
+
+    def _report_status(self, message):
+        """Pass a status message (e.g. a fallback that was taken) to the UI"""
+        if message and self.on_status:
+            self.on_status(message)
+
+    def _wake_word_spotter(self):
+        """Create the hands-free wake word spotter (None when disabled); the phrase defaults to ai_name"""
+        if not self.config.get('wake_word_enabled', False):
+            return None
+
+        phrase = self.config.get('wake_word') or self.config.get('ai_name', 'Assistant')
+        return WakeWordSpotter(
+            phrase,
+            vosk_model_path=self.config.get('vosk_model_path', 'models/vosk-model-small-en-us-0.15')
+        )
+
+    def _on_hands_free_speech(self, user_text):
+        """Handle an utterance picked up by hands-free listening"""
+        if not self.is_running:
+            return
+
+        if self.on_user_speech:
+            self.on_user_speech(user_text)
+        self.process_voice_text(user_text)
+
+    def _screen_text(self, capture, max_chars=1500):
+        """Get a capture's OCR text if it should be sent instead of the image, else None
+
+        Used when OCR found enough words with high confidence, or whenever there is
+        some text but no vision model to send the image to.
+        """
+        ocr = getattr(capture, 'ocr', None)
+        if not ocr or not ocr['words']:
+            return None
+
+        confident = (ocr['confidence'] >= self.config.get('screen_ocr_min_confidence', 75) and
+                     ocr['words'] >= self.config.get('screen_ocr_min_words', 8))
+        if confident or not self.llm.vision_model():
+            return ocr['text'][:max_chars]
+        return None
+
+    def _on_scene_change(self, frame):
+        """React to a settled scene change from the screen watcher; returns True if a reply was started"""
+        if not self.is_running or not self._is_idle():
+            return False
+        if not self.llm.vision_model() and not self.inputs.screen.ocr_enabled:
+            return False
+
+        capture = self.inputs.screen.encode_frame(frame)
+        prompt = self.config.get('screen_watch_prompt',
+                                 "Something just changed on screen. React to what just happened in one short sentence.")
+        threading.Thread(
+            target=self._process_and_respond,
+            args=(prompt, capture),
+            kwargs={'deadline': self.make_deadline('screen')},
+            daemon=True
+        ).start()
+        return True
 
     def process_text_input(self, text):
         """Process text input"""
         if text.strip():
-            self._process_and_respond(text)
+            self._process_and_respond(text, deadline=self.make_deadline('text'))
+
+    def make_deadline(self, source, received_at=None):
+        """Get the time after which a reply to this input is stale (None = never)
+
+        The expiry comes from '<source>_reply_expiry' in the config, in seconds,
+        falling back to the default for configs saved before the key existed.
+        """
+        key = f'{source}_reply_expiry'
+        expiry = self.config.get(key, self._default_config().get(key, 0))
+        if not expiry:
+            return None
+        return (received_at or time.time()) + expiry
+
+    def _is_expired(self, deadline, stage):
+        """Check a deadline at a pipeline stage boundary and count dropped work"""
+        if deadline is None or time.time() < deadline:
+            return False
+
+        with self.stats_lock:
+            self.expired_counts[stage] += 1
+        return True
+
+    def get_expired_counts(self):
+        """Get how much stale work was dropped at each pipeline stage"""
+        with self.stats_lock:
+            return dict(self.expired_counts)
+
+    def _update_load(self):
+        """Feed the current backlog to the load controller and recompute pressure"""
+        depth = len(self.tts_queue)
+        if self.inputs.twitch:
+            depth += self.inputs.twitch.message_queue.qsize()
 
-    def _process_and_respond(self, user_input, image_data=None):
-        """Process input and generate response"""
+        self.load.set_queue_depth(depth)
+        return self.load.update()
+
+    def _process_and_respond(self, user_input, image_data=None, deadline=None, history_input=None,
+                             cache_key=None, cache_user=None):
+        """Process input and generate response
+
+        history_input, when given, is stored in the conversation history in place of user_input.
+        cache_key is the text to look up in the response cache (default user_input) and
+        cache_user the chatter whose name may appear in the reply. Returns True if a reply
+        was queued for speech.
+        """
         if not self.is_running:
             return
 
+        if self._is_expired(deadline, 'llm'):
+            return
+
         try:
             response_length = self.config.get('response_length', 'normal')
             if response_length == 'brief':
@@ -462,43 +878,103 @@ class ChatbotEngine:
             else:
                 max_tokens = 150
 
-            model = self.config['llm_model']
-            vision_models = ['gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo']
-
-            try:
-                if image_data and model in vision_models:
-                    response = self.llm.chat_with_vision(user_input, image_data, max_response_tokens=max_tokens)
-                else:
-                    response = self.llm.chat(user_input, max_response_tokens=max_tokens)
-
-            except Exception as e:
-                # HANDLE RATE LIMITING
-                error_str = str(e).lower()
-                if 'rate' in error_str or 'quota' in error_str or 'limit' in error_str or '429' in error_str:
-                    response = self.config.get('rate_limit_response',
-                                               "I'm a bit overwhelmed right now, give me a moment!")
-                else:
-                    raise
+            instructions = None
+            if self.config.get('adaptive_load', False):
+                self._update_load()
+                max_tokens = self.load.max_tokens(max_tokens, self.config.get('adaptive_min_tokens', 40))
+                instructions = self.load.brevity_instruction()
+
+            cache = self.response_cache if image_data is None and history_input is None else None
+            cache_key = cache_key or user_input
+            cacheable = cache is not None
+
+            # Same screen as last time: describe it from memory instead of sending the image again
+            screen_capture = image_data
+            if image_data is not None and hasattr(image_data, 'fingerprint'):
+                description = self.inputs.screen.unchanged_description(image_data)
+                if description:
+                    user_input = (f"{user_input}\n\n[The screen looks the same as when you last described it: "
+                                  f"{description}]")
+                    image_data = None
+
+            # Mostly-text screen read confidently by OCR: send the text instead of the image
+            text_model = None
+            screen_text = self._screen_text(image_data)
+            if screen_text:
+                if history_input is None:
+                    history_input = f"{user_input}\n[screen text omitted]"
+                user_input = f"{user_input}\n\n[Text on screen (OCR):\n{screen_text}]"
+                image_data = None
+                text_model = self.config.get('screen_ocr_model') or None
+
+            response = None
+            if cache is not None and self._use_response_cache():
+                response = cache.get(cache_key, cache_user)
+                cacheable = response is None
+
+            if response is None:
+                try:
+                    llm_start = time.time()
+                    if image_data and self.llm.vision_model():
+                        response = self.llm.chat_with_vision(user_input, image_data, max_response_tokens=max_tokens,
+                                                             instructions=instructions)
+                        if not response.startswith(('Error getting', 'Vision not supported')):
+                            self.inputs.screen.remember_description(screen_capture, response)
+                    else:
+                        response = self.llm.chat(user_input, max_response_tokens=max_tokens, instructions=instructions,
+                                                 history_message=history_input, model=text_model)
+                    self.load.record_latency('llm', time.time() - llm_start)
+
+                except Exception as e:
+                    # HANDLE RATE LIMITING
+                    error_str = str(e).lower()
+                    if 'rate' in error_str or 'quota' in error_str or 'limit' in error_str or '429' in error_str:
+                        response = self.config.get('rate_limit_response',
+                                                   "I'm a bit overwhelmed right now, give me a moment!")
+                        cacheable = False
+                    else:
+                        raise
+
+            if cacheable and not response.startswith('Error getting'):
+                cache.put(cache_key, response, cache_user)
 
             if self.on_response_callback:
                 self.on_response_callback(response)
 
             # QUEUE THE SPEECH instead of speaking directly
-            self._queue_speech(response)
+            self._queue_speech(response, deadline)
             self.save_conversation_history()
+            return True
 
         except Exception:
-            pass
+            return False
+
+    def _use_response_cache(self):
+        """Check whether cached replies may be served right now"""
+        if not self.config.get('response_cache_only_under_load', False):
+            return True
+        return self.load.get_pressure() >= 0.3
 
-    def _queue_speech(self, text):
-        """Add speech to queue for sequential processing"""
+    def _queue_speech(self, text, deadline=None, kind='reply', prefix=None):
+        """Add speech to queue for sequential processing; returns the queue entry"""
+        entry = (text, deadline, kind, prefix)
         with self.tts_lock:
-            self.tts_queue.append(text)
+            self.tts_queue.append(entry)
 
             # Start processing if not already running
             if not self.tts_processing:
                 self.tts_processing = True
                 threading.Thread(target=self._process_tts_queue, daemon=True).start()
+        return entry
+
+    def _unqueue_speech(self, entry):
+        """Withdraw a queue entry that hasn't started playing; returns True if it was still waiting"""
+        with self.tts_lock:
+            for i, queued in enumerate(self.tts_queue):
+                if queued is entry:
+                    del self.tts_queue[i]
+                    return True
+        return False
 
     def _process_tts_queue(self):
         """Process TTS queue sequentially - ensures bot finishes speaking before next message"""
@@ -508,42 +984,118 @@ class ChatbotEngine:
                     self.tts_processing = False
                     break
 
-                text = self.tts_queue.popleft()
+                text, deadline, kind, prefix = self.tts_queue.popleft()
 
             # Speak the response (blocks until complete)
-            self._speak_response(text)
+            self._speak_response(text, deadline, kind, prefix)
 
-    def _speak_response(self, text):
-        """Speak response with Twitch context"""
-        if not text.strip():
+    def _speak_response(self, text, deadline=None, kind='reply', prefix=None):
+        """Speak a queued reply or chat read-back, behind a cached prefix clip if given"""
+        if not text.strip() and not prefix:
             return
 
         # STRIP EMOJIS FROM BOT'S OUTPUT
-        clean_text = self._strip_emojis(text)
+        tts_text = self._strip_emojis(text)
+
+        # Read-backs are timed separately so they add to, rather than dilute, the per-reply cost
+        stage_prefix = '' if kind == 'reply' else f'{kind}_'
+
+        if self._is_expired(deadline, 'synthesis'):
+            return
+
+        try:
+            synthesis_start = time.time()
+            if prefix:
+                audio_files = self.tts.synthesize_with_prefix(prefix, tts_text)
+            else:
+                # Long replies are synthesized in chunks; playback starts with the first one
+                audio_files = self.tts.synthesize_stream(tts_text)
+
+            playback_time = None
+            for audio_file in audio_files:
+                if not audio_file:
+                    continue
+
+                if playback_time is None:
+                    # Time to first audio is what the listener waits for
+                    self.load.record_latency(f'{stage_prefix}synthesis', time.time() - synthesis_start)
+                    playback_time = 0.0
+
+                if self._is_expired(deadline, 'playback'):
+                    return
+
+                # Blocks until playback is complete
+                playback_start = time.time()
+                self.tts.play(audio_file, speed=self._playback_speed())
+                playback_time += time.time() - playback_start
+
+            if playback_time is not None:
+                self.load.record_latency(f'{stage_prefix}playback', playback_time)
+
+        except Exception:
+            pass
+
+    def _is_idle(self):
+        """Check that nothing is being generated or spoken and chat is calm"""
+        with self.tts_lock:
+            speech_pending = self.tts_processing or bool(self.tts_queue)
+
+        return not speech_pending and not self.is_speaking and self.load.get_pressure() < 0.3
+
+    def _prewarm_jobs(self):
+        """List what the pre-warmer should keep cached, as (text, is_name_clip) pairs"""
+        jobs = [(self.config.get('rate_limit_response', ''), False),
+                (self.config.get('no_answer_response', ''), False),
+                (AUDIO_SENSITIVITY_TEST_TEXT, False)]
+        jobs += [(phrase, False) for phrase in self.config.get('prewarm_phrases', [])]
+
+        top_chatters = self.chatter_counts.most_common(self.config.get('prewarm_top_chatters', 20))
+        for username, _ in top_chatters:
+            prefix, _ = self._twitch_readback(username, 'x')
+            if prefix:
+                jobs.append((prefix, True))
 
-        tts_text = clean_text
+        return [job for job in jobs if job[0] and job[0].strip()]
 
-        if self.current_twitch_username or self.current_twitch_message:
-            prepend_parts = []
+    def _prewarm_loop(self):
+        """Synthesize cache entries one at a time while the engine is idle"""
+        while self.is_running:
+            time.sleep(self.config.get('prewarm_interval', 2))
 
-            if self.config.get('twitch_speak_username', True) and self.current_twitch_username:
-                prepend_parts.append(self.current_twitch_username)
+            if not self.tts or not self.config.get('prewarm_enabled', True) or not self._is_idle():
+                continue
 
-            if self.config.get('twitch_speak_message', True) and self.current_twitch_message:
-                if prepend_parts:
-                    prepend_parts.append(f"said: {self.current_twitch_message}")
-                else:
-                    prepend_parts.append(self.current_twitch_message)
+            # Don't spend paid characters on clips nobody asked for unless the user opted in
+            if self.tts.service in PAID_PROVIDERS and not self.config.get('prewarm_paid_providers', False):
+                continue
 
-            if prepend_parts:
-                tts_text = " ".join(prepend_parts) + ". " + clean_text
+            for text, is_name_clip in self._prewarm_jobs():
+                if (text, is_name_clip) in self.prewarm_failed or self.tts.is_cached(text, is_name_clip):
+                    continue
 
-        def speak_thread():
-            self.tts.speak(tts_text)
+                try:
+                    audio_file = self.tts.prewarm(text, is_name_clip)
+                except Exception:
+                    audio_file = None
+
+                # Don't keep retrying a phrase the provider refuses
+                if not audio_file:
+                    self.prewarm_failed.add((text, is_name_clip))
+
+                # One job per idle tick so real replies never wait long behind the warmer
+                break
+
+    def _playback_speed(self):
+        """Pick a playback speed from the speech backlog (1.0 when nothing is waiting)"""
+        if not self.config.get('playback_speedup', False):
+            return 1.0
+
+        max_speed = self.config.get('max_playback_speed', 1.25)
+        with self.tts_lock:
+            waiting = len(self.tts_queue)
 
-        thread = threading.Thread(target=speak_thread, daemon=True)
-        thread.start()
-        thread.join()  # Wait for speech to complete
+        # Ramp up to full speed once three replies are waiting behind this one
+        return 1.0 + (max_speed - 1.0) * min(waiting, 3) / 3
 
     def _show_avatar(self, state):
         """Show avatar in specific state"""
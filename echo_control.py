@@ -0,0 +1,105 @@
+﻿"""
+Echo Control - Keep the bot's own voice out of the microphone
+"""
+
+import time
+import numpy as np
+
+
+class NLMSEchoCanceller:
+    def __init__(self, filter_len=512, step=0.5, eps=1e-6, double_talk=0.5):
+        """Block NLMS adaptive filter that learns the speaker-to-mic echo path and subtracts it
+
+        filter_len taps cover the echo tail after the bulk delay (512 = 32 ms at 16 kHz).
+        Adaptation pauses when the mic is louder than double_talk times the recent
+        reference peak (Geigel test), so the user talking over the bot isn't learned as echo.
+        """
+        self.filter_len = filter_len
+        self.step = step
+        self.eps = eps
+        self.double_talk = double_talk
+        self.weights = np.zeros(filter_len, dtype=np.float64)
+
+    def process(self, mic, reference):
+        """Cancel echo in one block
+
+        mic is the block's samples (n,), reference the played samples aligned with it,
+        preceded by filter_len - 1 samples of history (n + filter_len - 1,).
+        Returns the cleaned block.
+        """
+        mic = np.asarray(mic, dtype=np.float64)
+        reference = np.asarray(reference, dtype=np.float64)
+
+        echo = np.convolve(reference, self.weights, mode='valid')
+        error = mic - echo
+
+        if np.max(np.abs(mic)) <= self.double_talk * (np.max(np.abs(reference)) + self.eps):
+            energy = float(np.dot(reference, reference)) * self.filter_len / len(reference)
+            gradient = np.correlate(reference, error, mode='valid')[::-1]
+            self.weights += self.step * gradient / (energy + self.eps)
+
+        return error
+
+    def reset(self):
+        """Forget the learned echo path"""
+        self.weights[:] = 0.0
+
+
+class EchoSuppressor:
+    def __init__(self, tts, mode='gate', sample_rate=16000, tail=0.3, delay=0.1, filter_len=512):
+        """Filter microphone frames against the TTS playback timeline
+
+        mode 'gate' drops frames while the bot speaks and for tail seconds after;
+        mode 'nlms' subtracts an adaptive estimate of the echo instead, using the
+        playing clip as reference (delay is the bulk output-to-mic latency);
+        'off' passes everything through. tts is the TTSManager, or a callable returning
+        the current one (the app swaps managers when the voice changes).
+        """
+        self.get_tts = tts if callable(tts) else (lambda: tts)
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.tail = tail
+        self.delay = delay
+        self.canceller = NLMSEchoCanceller(filter_len) if mode == 'nlms' else None
+
+    def bot_audible(self, now=None):
+        """Check whether the bot's voice could be reaching the mic"""
+        tts = self.get_tts()
+        if not tts:
+            return False
+
+        # The canceller needs the played samples; ask whichever manager is current for them
+        if self.canceller:
+            tts.echo_reference = True
+
+        now = now or time.time()
+        started, ended, _ = tts.get_playback_timeline()
+        if tts.is_playing and started is not None:
+            return True
+        return now - ended < self.tail
+
+    def process(self, frame, captured_at=None):
+        """Filter one 16-bit PCM frame; returns the frame to use, or None to drop it"""
+        if self.mode == 'off' or not self.bot_audible(captured_at):
+            return frame
+
+        if self.mode == 'gate':
+            return None
+
+        started, _, reference = self.get_tts().get_playback_timeline()
+        if reference is None or started is None:
+            return None
+
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float64) / 32768.0
+        captured_at = captured_at or time.time()
+
+        # Reference samples that were playing when this frame was captured, plus filter history
+        end = int(round((captured_at - started - self.delay) * self.sample_rate))
+        start = end - len(samples) - self.canceller.filter_len + 1
+        window = np.zeros(end - start)
+        lo, hi = max(0, start), min(len(reference), end)
+        if hi > lo:
+            window[lo - start:hi - start] = reference[lo:hi]
+
+        cleaned = self.canceller.process(samples, window)
+        return (np.clip(cleaned, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
@@ -0,0 +1,184 @@
+﻿"""
+Image Pipeline - Screen grabs to compact JPEG/WebP bytes for vision requests
+"""
+
+import base64
+import math
+import threading
+from io import BytesIO
+import numpy as np
+from PIL import Image, ImageGrab
+
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+
+
+# Images no larger than this are sent in the API's low-detail mode (flat ~85 tokens)
+LOW_DETAIL_SIZE = 512
+
+# Greyscale sample used to compare frames: fine enough to tell two text pages apart
+SAMPLE_SIZE = (64, 36)
+
+_MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'png': 'image/png'}
+
+# mss handles are per-thread (they hold OS display resources)
+_grabbers = threading.local()
+
+
+class EncodedImage:
+    def __init__(self, data, mime='image/jpeg', size=None, detail='auto', fingerprint=None):
+        """Encoded image bytes ready to attach to a vision request
+
+        fingerprint is the frame's small greyscale sample, used to spot repeated
+        screens; ocr holds the screen_ocr result when OCR is enabled.
+        """
+        self.data = data
+        self.mime = mime
+        self.size = size
+        self.detail = detail
+        self.fingerprint = fingerprint
+        self.ocr = None
+
+    def data_url(self):
+        """Get the image as a base64 data URL"""
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+    def content_part(self):
+        """Get the image as an OpenAI chat message content part"""
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": self.data_url(),
+                "detail": self.detail
+            }
+        }
+
+
+def grab(region=None):
+    """Grab the screen (or a (left, top, right, bottom) region) as an RGB PIL image"""
+    if MSS_AVAILABLE:
+        try:
+            if not hasattr(_grabbers, 'sct'):
+                _grabbers.sct = mss.mss()
+            sct = _grabbers.sct
+
+            if region:
+                left, top, right, bottom = region
+                monitor = {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+            else:
+                monitor = sct.monitors[1] if len(sct.monitors) > 1 else sct.monitors[0]
+
+            shot = sct.grab(monitor)
+            return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+        except Exception:
+            pass
+
+    return ImageGrab.grab(bbox=region).convert('RGB')
+
+
+def sample(image, size=SAMPLE_SIZE):
+    """Shrink an image to a small greyscale array in 0-1 for frame comparison"""
+    small = image.convert('L').resize(size, Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def sample_difference(a, b):
+    """Mean absolute difference of two samples (0 = identical, 1 = inverted)
+
+    A clock or cursor change scores well under 0.001; a different page of text
+    in the same layout scores around 0.01-0.02; a new scene far more.
+    """
+    if a.shape != b.shape:
+        return 1.0
+    return float(np.abs(a - b).mean())
+
+
+def encode(image, max_size=1024, image_format='jpeg', quality=70, detail='auto'):
+    """Downsample and compress a PIL image into an EncodedImage
+
+    detail 'low' caps the size at LOW_DETAIL_SIZE; 'auto' switches to low detail
+    whenever the image ends up that small anyway.
+    """
+    image_format = image_format.lower()
+    if image_format not in _MIME_TYPES:
+        image_format = 'jpeg'
+
+    if detail == 'low':
+        max_size = min(max_size, LOW_DETAIL_SIZE)
+
+    image = image.copy() if image.mode == 'RGB' else image.convert('RGB')
+    # thumbnail() box-reduces by whole factors first, so bilinear on the remainder is enough
+    image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR)
+
+    if detail == 'auto' and max(image.size) <= LOW_DETAIL_SIZE:
+        detail = 'low'
+
+    buffered = BytesIO()
+    if image_format == 'jpeg':
+        image.save(buffered, format='JPEG', quality=quality, optimize=False)
+    elif image_format == 'webp':
+        image.save(buffered, format='WEBP', quality=quality, method=0)
+    else:
+        image.save(buffered, format='PNG', compress_level=1)
+
+    return EncodedImage(buffered.getvalue(), _MIME_TYPES[image_format], image.size, detail, sample(image))
+
+
+def image_content_part(image):
+    """Get an OpenAI content part for an EncodedImage, raw bytes, a PIL image, a data URL or a file path"""
+    if isinstance(image, EncodedImage):
+        return image.content_part()
+
+    if isinstance(image, Image.Image):
+        return encode(image).content_part()
+
+    if isinstance(image, (bytes, bytearray)):
+        return EncodedImage(bytes(image), _guess_mime(image)).content_part()
+
+    if isinstance(image, str) and image.startswith('data:'):
+        return {"type": "image_url", "image_url": {"url": image}}
+
+    with open(image, 'rb') as image_file:
+        data = image_file.read()
+    return EncodedImage(data, _guess_mime(data)).content_part()
+
+
+def image_tokens(part):
+    """Estimate the prompt tokens an image content part costs (OpenAI tiling rules)
+
+    Low detail is a flat 85. Otherwise the image is fitted in 2048x2048, its short
+    side scaled to 768, and each 512px tile costs 170 on top of the base 85.
+    """
+    image_url = part.get('image_url', {})
+    if image_url.get('detail') == 'low':
+        return 85
+
+    size = None
+    url = image_url.get('url', '')
+    if url.startswith('data:'):
+        try:
+            size = Image.open(BytesIO(base64.b64decode(url.split(',', 1)[1]))).size
+        except Exception:
+            pass
+    if not size:
+        return 765
+
+    width, height = size
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _guess_mime(data):
+    """Guess an image's MIME type from its magic bytes"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
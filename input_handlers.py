@@ -4,13 +4,16 @@ Twitch Chat, Microphone, Screen Capture
 """
 
 import os
+import re
+import json
 import threading
+import time
 import queue
 import speech_recognition as sr
-from PIL import ImageGrab, Image
-import base64
-from io import BytesIO
 import socket
+from image_pipeline import grab, encode, sample_difference
+from microphone_stream import MicrophoneStream, frame_rms
+from voice_activity import VoiceActivityDetector
 
 
 class TwitchChatHandler:
@@ -72,7 +75,8 @@ class TwitchChatHandler:
 
                         self.message_queue.put({
                             'username': username,
-                            'message': message
+                            'message': message,
+                            'received_at': time.time()
                         })
 
                 except Exception:
@@ -94,10 +98,190 @@ class TwitchChatHandler:
         return not self.message_queue.empty()
 
 
+class GoogleSTT:
+    """Google Web Speech recognition: needs the whole utterance, then one network call"""
+    streaming = False
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio):
+        """Transcribe sr.AudioData; returns None if nothing was understood"""
+        try:
+            return self.recognizer.recognize_google(audio) or None
+        except sr.UnknownValueError:
+            return None
+
+
+_VOSK_MODELS = {}
+
+
+def _load_vosk_model(model_path):
+    """Load a Vosk model once and share it (raises ImportError without vosk)"""
+    import vosk
+
+    vosk.SetLogLevel(-1)
+    if model_path not in _VOSK_MODELS:
+        _VOSK_MODELS[model_path] = vosk.Model(model_path)
+    return vosk, _VOSK_MODELS[model_path]
+
+
+class VoskSTT:
+    """Offline Vosk recognition that decodes frames while the user is still speaking"""
+    streaming = True
+
+    def __init__(self, model_path, sample_rate=16000):
+        self.vosk, self.model = _load_vosk_model(model_path)
+        self.sample_rate = sample_rate
+
+    def transcribe(self, audio):
+        """Transcribe a finished sr.AudioData in one go"""
+        recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        return json.loads(recognizer.FinalResult()).get('text') or None
+
+    def stream(self, on_partial=None):
+        """Start a streaming session for 16-bit mono PCM frames at sample_rate"""
+        return StreamingTranscription(self.vosk.KaldiRecognizer(self.model, self.sample_rate), on_partial)
+
+
+class StreamingTranscription:
+    def __init__(self, recognizer, on_partial=None):
+        """Feed live frames to a Vosk recognizer on a worker thread
+
+        feed() is safe to call from the audio callback: it only queues the frame.
+        on_partial(text) is called with the running transcript as it changes.
+        """
+        self.recognizer = recognizer
+        self.on_partial = on_partial
+        self.frames = queue.Queue()
+        self.segments = []
+        self.partial = ''
+
+        self.thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.thread.start()
+
+    def feed(self, frame, level=None):
+        """Queue one frame for decoding"""
+        self.frames.put(frame)
+
+    def _decode_loop(self):
+        """Decode queued frames until finish() sends the end marker"""
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+
+            if self.recognizer.AcceptWaveform(frame):
+                # Vosk closed a segment at a pause; keep it and start a new partial
+                text = json.loads(self.recognizer.Result()).get('text', '')
+                if text:
+                    self.segments.append(text)
+                self.partial = ''
+            else:
+                partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+                if partial == self.partial:
+                    continue
+                self.partial = partial
+
+            if self.on_partial:
+                try:
+                    self.on_partial(' '.join(self.segments + [self.partial]).strip())
+                except Exception:
+                    pass
+
+    def finish(self):
+        """Decode what's left and return the final transcript (None if nothing was said)"""
+        self.frames.put(None)
+        self.thread.join()
+
+        text = json.loads(self.recognizer.FinalResult()).get('text', '')
+        if text:
+            self.segments.append(text)
+        return ' '.join(self.segments).strip() or None
+
+
+class WakeWordSpotter:
+    def __init__(self, phrase, vosk_model_path=None, sample_rate=16000):
+        """Check speech segments for a wake phrase before paying for full recognition
+
+        Uses a Vosk recognizer whose grammar only knows the phrase (everything else
+        is [unk]), which is far cheaper than open-vocabulary decoding. Without Vosk,
+        or when a phrase word isn't in the model's vocabulary (Vosk silently drops
+        those from a grammar, common for custom bot names), heard() can't tell and
+        the caller has to check the full transcript instead; status then says why.
+        """
+        self.phrase = ' '.join(re.sub(r"[^\w\s']", ' ', phrase.lower()).split())
+        self.sample_rate = sample_rate
+        self.vosk = None
+        self.model = None
+        self.status = None
+
+        try:
+            self.vosk, self.model = _load_vosk_model(vosk_model_path)
+        except ImportError:
+            self.status = "vosk not installed, wake word checked on full transcripts. Install with: pip install vosk"
+        except Exception as e:
+            self.status = f"Could not load Vosk model for the wake word from {vosk_model_path}: {e}"
+
+        if self.model and self.phrase:
+            missing = self._missing_words()
+            if missing:
+                self.status = (f"Wake word {', '.join(missing)} not in the Vosk vocabulary, "
+                               f"checking full transcripts instead")
+                self.model = None
+
+    def _missing_words(self):
+        """Get the phrase words the Vosk model can't recognise"""
+        words = self.phrase.split()
+        try:
+            return [word for word in words if self.model.find_word(word) < 0]
+        except Exception:
+            # Older Vosk builds can't look words up, so the grammar can't be trusted
+            return words
+
+    def heard(self, pcm):
+        """Check 16-bit mono PCM for the phrase (None = can't tell without full STT)"""
+        if not self.model or not self.phrase:
+            return None
+
+        recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate, json.dumps([self.phrase, '[unk]']))
+        recognizer.AcceptWaveform(pcm)
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        return f' {self.phrase} ' in f' {text} '
+
+    def strip(self, text):
+        """Get what was said after the wake phrase ('' if nothing), or None if the phrase isn't in text"""
+        if not text or not self.phrase:
+            return None
+
+        pattern = r'\b' + r'\W+'.join(re.escape(word) for word in self.phrase.split()) + r'\b'
+        match = re.search(pattern, text, flags=re.IGNORECASE)
+        if not match:
+            return None
+        return text[match.end():].strip(' ,.!?')
+
+
+def create_stt(backend='google', vosk_model_path=None):
+    """Create a speech-to-text backend ('google' or 'vosk'), falling back to Google if Vosk can't load
+
+    Returns (backend, status); status explains a fallback and is None otherwise.
+    """
+    if backend == 'vosk':
+        try:
+            return VoskSTT(vosk_model_path), None
+        except ImportError:
+            return GoogleSTT(), "vosk not installed, using Google speech recognition. Install with: pip install vosk"
+        except Exception as e:
+            return GoogleSTT(), f"Could not load Vosk model from {vosk_model_path}, using Google speech recognition: {e}"
+    return GoogleSTT(), None
+
+
 class MicrophoneHandler:
     def __init__(self):
         """Initialize microphone handler"""
         self.recognizer = sr.Recognizer()
+        self.stt = GoogleSTT()
         self.microphone = None
         self.is_available = False
 
@@ -122,10 +306,7 @@ class MicrophoneHandler:
                 audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
 
             try:
-                text = self.recognizer.recognize_google(audio)
-                return text
-            except sr.UnknownValueError:
-                return None
+                return self.stt.transcribe(audio)
             except sr.RequestError:
                 return None
 
@@ -152,33 +333,100 @@ class ScreenCaptureHandler:
         """Initialize screen capture handler"""
         self.last_capture = None
 
-    def capture_screen(self, region=None):
-        """Capture screenshot and return as base64 encoded image"""
-        try:
-            if region:
-                screenshot = ImageGrab.grab(bbox=region)
-            else:
-                screenshot = ImageGrab.grab()
+        self.max_size = 1024
+        self.image_format = 'jpeg'
+        self.quality = 70
+        self.detail = 'auto'
+
+        # What the model said about the last screen it saw, reused while the screen looks the same
+        self.change_threshold = 0.005
+        self.description_max_age = 60.0
+        self.described_fingerprint = None
+        self.described_text = None
+        self.described_at = 0.0
+        self.last_description = None
+
+        self.ocr_enabled = False
+
+    def configure(self, max_size=1024, image_format='jpeg', quality=70, detail='auto', change_threshold=0.005,
+                  ocr_enabled=False, description_max_age=60.0):
+        """Set the capture size, encoding (jpeg/webp/png), quality and vision detail (low/high/auto)
+
+        change_threshold is the mean pixel difference (0-1) of the frames' greyscale
+        samples below which a frame counts as the same screen (0 = always send the
+        image); a remembered description is reused for at most description_max_age
+        seconds. ocr_enabled reads the text on each capture with Tesseract (needs pytesseract).
+        """
+        self.max_size = max_size
+        self.image_format = image_format
+        self.quality = quality
+        self.detail = detail
+        self.change_threshold = change_threshold
+        self.description_max_age = description_max_age
+
+        self.ocr_enabled = False
+        if ocr_enabled:
+            import screen_ocr
+            self.ocr_enabled = screen_ocr.TESSERACT_AVAILABLE
+
+    def remember_description(self, capture, description):
+        """Keep the model's reply about a captured frame"""
+        if capture is None or capture.fingerprint is None or not description:
+            return
+        self.described_fingerprint = capture.fingerprint
+        self.described_text = self._ocr_text(capture)
+        self.described_at = time.time()
+        self.last_description = description
 
-            max_size = (1024, 1024)
-            screenshot.thumbnail(max_size, Image.Resampling.LANCZOS)
+    def unchanged_description(self, capture):
+        """Get the last description if this frame looks the same as the one it describes, else None
 
-            buffered = BytesIO()
-            screenshot.save(buffered, format="PNG")
-            img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        Text that OCR reads differently (a new page in the same layout) always counts as a new screen.
+        """
+        if not self.change_threshold or self.described_fingerprint is None:
+            return None
+        if capture is None or capture.fingerprint is None:
+            return None
+        if time.time() - self.described_at > self.description_max_age:
+            return None
+        if self._ocr_text(capture) != self.described_text:
+            return None
 
-            self.last_capture = img_base64
+        if sample_difference(capture.fingerprint, self.described_fingerprint) < self.change_threshold:
+            return self.last_description
+        return None
 
-            return f"data:image/png;base64,{img_base64}"
+    def _ocr_text(self, capture):
+        """Get a capture's OCR text with whitespace collapsed (None without OCR)"""
+        if not capture.ocr:
+            return None
+        return ' '.join(capture.ocr.get('text', '').split())
+
+    def capture_screen(self, region=None):
+        """Capture screenshot and return it as an EncodedImage"""
+        try:
+            return self.encode_frame(grab(region))
 
         except Exception:
             return None
 
+    def encode_frame(self, frame):
+        """Encode an already grabbed frame with the capture settings"""
+        self.last_capture = encode(frame, self.max_size, self.image_format, self.quality, self.detail)
+
+        if self.ocr_enabled:
+            # OCR the full-resolution frame; the encoded copy is too small for reliable text
+            try:
+                from screen_ocr import read_text
+                self.last_capture.ocr = read_text(frame)
+            except Exception:
+                self.ocr_enabled = False
+
+        return self.last_capture
+
     def get_last_capture(self):
         """Get the last captured screenshot"""
-        if self.last_capture:
-            return f"data:image/png;base64,{self.last_capture}"
-        return None
+        return self.last_capture
 
     def capture_window(self, window_title):
         """Capture specific window (platform-specific)"""
@@ -190,6 +438,8 @@ class InputManager:
         """Initialize all input handlers"""
         self.twitch = None
         self.microphone = MicrophoneHandler()
+        self.mic_stream = None
+        self.stt = self.microphone.stt
         self.screen = ScreenCaptureHandler()
 
         self.enabled_inputs = {
@@ -210,6 +460,23 @@ class InputManager:
             self.twitch.stop()
         self.enabled_inputs['twitch'] = False
 
+    def start_mic_stream(self, preroll=0.5):
+        """Open the always-on microphone stream used for push-to-talk (returns False if unavailable)"""
+        if not self.mic_stream:
+            self.mic_stream = MicrophoneStream(preroll=preroll)
+        return self.mic_stream.start()
+
+    def set_stt_backend(self, backend='google', vosk_model_path=None):
+        """Choose the speech-to-text backend used for all microphone input; returns a status if it fell back"""
+        self.stt, status = create_stt(backend, vosk_model_path)
+        self.microphone.stt = self.stt
+        return status
+
+    def stop_mic_stream(self):
+        """Close the microphone stream"""
+        if self.mic_stream:
+            self.mic_stream.stop()
+
     def enable_microphone(self):
         """Enable microphone input"""
         self.enabled_inputs['microphone'] = True
@@ -242,6 +509,97 @@ class InputManager:
             return self.microphone.listen_once(timeout)
         return None
 
+    def listen_continuous(self, callback, stop_event, vad_aggressiveness=2, hangover=0.5, echo=None,
+                          wake=None, wake_timeout=8.0):
+        """Hands-free listening: call callback(text) for every utterance until stop_event is set
+
+        On the open microphone stream, voice activity detection finds where each
+        utterance starts and ends, and only those segments go to speech-to-text.
+        echo (an echo_control.EchoSuppressor) gates or cleans frames while the bot
+        is speaking. With wake (a WakeWordSpotter), utterances are only transcribed
+        once they contain the wake phrase; a bare wake phrase arms the next
+        utterance for wake_timeout seconds. Returns the worker thread, or None when
+        the stream isn't available (the old listen-loop can't gate echo or the wake word).
+        """
+        if not (self.mic_stream and self.mic_stream.is_open()):
+            return None
+
+        mic_stream = self.mic_stream
+        vad = VoiceActivityDetector(
+            sample_rate=mic_stream.sample_rate,
+            frame_seconds=mic_stream.frame_seconds,
+            aggressiveness=vad_aggressiveness,
+            hangover=hangover,
+            ambient=lambda: mic_stream.ambient_rms
+        )
+        utterances = queue.Queue()
+
+        def on_frame(frame, level):
+            # Push-to-talk has the mic; don't cut its audio into hands-free turns too
+            if mic_stream.is_recording():
+                vad.reset()
+                return
+
+            # Keep the bot's own voice from being heard as a new turn
+            if echo:
+                cleaned = echo.process(frame)
+                if cleaned is None:
+                    vad.reset()
+                    return
+                if cleaned is not frame:
+                    frame, level = cleaned, frame_rms(cleaned)
+
+            utterance = vad.process(frame, level)
+            if utterance:
+                utterances.put(utterance)
+
+        def transcribe(pcm):
+            try:
+                return self.stt.transcribe(sr.AudioData(pcm, mic_stream.sample_rate, 2))
+            except sr.RequestError:
+                return None
+
+        def transcribe_thread():
+            armed_until = 0.0
+            mic_stream.add_listener(on_frame)
+            try:
+                while not stop_event.is_set():
+                    try:
+                        pcm = utterances.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+
+                    if not self.enabled_inputs['microphone']:
+                        continue
+
+                    if wake and time.time() > armed_until:
+                        heard = wake.heard(pcm)
+                        if heard is False:
+                            continue
+
+                        text = transcribe(pcm)
+                        rest = wake.strip(text)
+                        if rest is None:
+                            if not heard:
+                                continue
+                            rest = text or ''
+                        if not rest:
+                            armed_until = time.time() + wake_timeout
+                            continue
+                        text = rest
+                    else:
+                        armed_until = 0.0
+                        text = transcribe(pcm)
+
+                    if text and callback:
+                        callback(text)
+            finally:
+                mic_stream.remove_listener(on_frame)
+
+        thread = threading.Thread(target=transcribe_thread, daemon=True)
+        thread.start()
+        return thread
+
     def capture_screen(self):
         """Capture screen if enabled"""
         if self.enabled_inputs['screen']:
@@ -266,6 +624,6 @@ if __name__ == '__main__':
     screen = ScreenCaptureHandler()
     capture = screen.capture_screen()
     if capture:
-        print(f"Screen captured! (base64 length: {len(capture)})")
+        print(f"Screen captured! ({len(capture.data)} bytes, {capture.size[0]}x{capture.size[1]})")
 
     print("\nTests complete!")
\ No newline at end of file
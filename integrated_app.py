@@ -7,7 +7,7 @@ import json
 import keyboard
 import threading
 from pathlib import Path
-from chatbot_engine import ChatbotEngine
+from chatbot_engine import ChatbotEngine, AUDIO_SENSITIVITY_TEST_TEXT
 from PIL import Image, ImageTk
 from dotenv import load_dotenv, set_key
 import updater
@@ -68,6 +68,7 @@ class IntegratedChatbotApp:
         self.config = self.engine.config
 
         self.is_recording = False
+        self.stt_session = None
         self.hotkey_active = False
 
         self.voice_options = {
@@ -97,6 +98,8 @@ class IntegratedChatbotApp:
         self.create_gui()
 
         self.engine.on_response_callback = self.display_response
+        self.engine.on_user_speech = lambda text: self.add_chat_message("You", text)
+        self.engine.on_status = lambda text: self.add_chat_message("System", f"⚠️ {text}")
         self.engine.on_speaking_start = self.on_ai_speaking_start
         self.engine.on_speaking_end = self.on_ai_speaking_end
         self.engine.on_volume_update = self.update_audio_meter
@@ -767,6 +770,10 @@ TWITCH_OAUTH_TOKEN=
             'llama-3.3-70b-versatile',
             'moonshotai/kimi-k2-instruct-0905',
         ]
+        custom_models = [model for endpoint in self.config.get('llm_endpoints', [])
+                         for model in endpoint.get('models', [])]
+        if custom_models:
+            models += ['--- Local / Custom Endpoints ---'] + custom_models
         self.llm_var = tk.StringVar(value=self.config['llm_model'])
         llm_menu = ttk.Combobox(config_frame, textvariable=self.llm_var,
                                 values=models, state='readonly', width=25)
@@ -1116,6 +1123,12 @@ TWITCH_OAUTH_TOKEN=
 
             self.engine.tts.set_volume_threshold(self.config.get('volume_threshold', 0.02))
 
+            self.engine.tts.set_failover_chain(
+                self.config.get('tts_failover_chain', []),
+                fallback_voices=self.config.get('tts_fallback_voices', {}),
+                hedge_requests=self.config.get('tts_hedge_requests', False)
+            )
+
             print(f"[App] TTS reinitialized with voice: {self.config['elevenlabs_voice']}")
 
     def on_response_style_change(self):
@@ -2684,12 +2697,7 @@ TWITCH_OAUTH_TOKEN=
             )
             return
 
-        test_text = (
-            "Testing audio sensitivity. "
-            "Watch the audio meter and avatar. "
-            "The mouth should open when volume is above the threshold. "
-            "Try adjusting the sensitivity slider if needed."
-        )
+        test_text = AUDIO_SENSITIVITY_TEST_TEXT
 
         self.add_chat_message("System", "Testing audio sensitivity - watch the meter and avatar!")
 
@@ -3160,7 +3168,7 @@ TWITCH_OAUTH_TOKEN=
 
         def test_thread():
             try:
-                from input_handlers import ScreenCaptureHandler
+                from llm_manager import supports_vision
                 import os
                 from openai import OpenAI
 
@@ -3177,9 +3185,8 @@ TWITCH_OAUTH_TOKEN=
                     return
 
                 model = self.config['llm_model']
-                vision_models = ['gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo']
 
-                if model not in vision_models:
+                if not supports_vision(model):
                     self.test_screenshot_label.config(
                         text=f"❌ {model} doesn't support vision",
                         fg='#f44336'
@@ -3191,8 +3198,7 @@ TWITCH_OAUTH_TOKEN=
                     )
                     return
 
-                screen = ScreenCaptureHandler()
-                image_data = screen.capture_screen()
+                image_data = self.engine.inputs.screen.capture_screen()
 
                 if not image_data:
                     self.test_screenshot_label.config(
@@ -3219,12 +3225,7 @@ TWITCH_OAUTH_TOKEN=
                                     "type": "text",
                                     "text": "What do you see in this screenshot? Please describe any text, windows, applications, UI elements, or content that's visible. Be specific and detailed."
                                 },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": image_data
-                                    }
-                                }
+                                image_data.content_part()
                             ]
                         }
                     ],
@@ -3523,6 +3524,15 @@ TWITCH_OAUTH_TOKEN=
         """When push-to-talk key is pressed"""
         if not self.is_recording and self.engine.is_running:
             self.is_recording = True
+            # Start the utterance right away (with pre-roll) on the already-open stream;
+            # streaming STT backends start transcribing while the key is still held
+            mic_stream = self.engine.inputs.mic_stream
+            stt = self.engine.inputs.stt
+            self.stt_session = None
+            if mic_stream and mic_stream.is_open():
+                if stt.streaming:
+                    self.stt_session = stt.stream(on_partial=self.show_partial_transcript)
+                mic_stream.begin_utterance(self.stt_session.feed if self.stt_session else None)
             self.recording_label.config(text="🔴 LISTENING... (speak now, release to send)")
             self.add_chat_message("System", "🎤 Recording started - speak now!")
             # Start recording in background thread
@@ -3534,40 +3544,48 @@ TWITCH_OAUTH_TOKEN=
             self.is_recording = False
             self.recording_label.config(text="⏳ Processing audio...")
 
+    def show_partial_transcript(self, text):
+        """Show the running transcript while push-to-talk is held"""
+        if self.is_recording and text:
+            self.root.after(0, lambda: self.recording_label.config(text=f"🔴 {text[-60:]}"))
+
     def capture_audio(self):
         """Capture audio and process when done"""
         import speech_recognition as sr
-        import time
 
         try:
-            recognizer = sr.Recognizer()
-            microphone = sr.Microphone()
-
-            with microphone as source:
-                # Quick ambient noise adjustment
-                recognizer.adjust_for_ambient_noise(source, duration=0.2)
-
-                # Capture audio - this will wait for speech and record it
-                # It blocks until phrase_time_limit is reached or silence detected
-                audio = recognizer.listen(
-                    source,
-                    timeout=1,  # Start listening within 1 second
-                    phrase_time_limit=10  # Max 10 seconds of speech
-                )
-
-            # Audio captured! Now wait a moment for key release if still held
-            time.sleep(0.1)
-            self.is_recording = False
+            mic_stream = self.engine.inputs.mic_stream
+            if mic_stream and mic_stream.is_open():
+                # Record until the key is released (max 10 seconds of speech)
+                mic_stream.wait_for_release(lambda: self.is_recording, max_seconds=10)
+                self.is_recording = False
+                audio = mic_stream.end_utterance()
+                stt_session, self.stt_session = self.stt_session, None
+
+                if not audio or not mic_stream.is_loud_enough(audio):
+                    if stt_session:
+                        stt_session.finish()
+                    self.recording_label.config(text="")
+                    self.add_chat_message("System", "❌ Timeout - didn't hear any speech")
+                    return
+            else:
+                # No shared stream (PyAudio stream failed or mic was off at start): open the mic for this turn
+                stt_session = None
+                audio = self.record_from_microphone()
 
             # Transcribe the captured audio
             self.add_chat_message("System", "🔄 Transcribing speech...")
 
             try:
-                text = recognizer.recognize_google(audio)
+                if stt_session:
+                    text = stt_session.finish()
+                else:
+                    text = self.engine.inputs.stt.transcribe(audio)
 
                 if text and text.strip():
                     self.recording_label.config(text="")
                     self.add_chat_message("You", text)
+                    deadline = self.engine.make_deadline('voice')
 
                     # Get screen capture if enabled
                     screen_data = None
@@ -3577,7 +3595,7 @@ TWITCH_OAUTH_TOKEN=
                         screen_data = self.engine.inputs.capture_screen()
 
                     # Send to AI
-                    self.engine._process_and_respond(text, screen_data)
+                    self.engine._process_and_respond(text, screen_data, deadline=deadline)
 
                 else:
                     self.recording_label.config(text="")
@@ -3604,6 +3622,27 @@ TWITCH_OAUTH_TOKEN=
             import traceback
             traceback.print_exc()
 
+    def record_from_microphone(self):
+        """Record one phrase by opening the microphone directly (raises sr.WaitTimeoutError)"""
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        with sr.Microphone() as source:
+            # Quick ambient noise adjustment
+            recognizer.adjust_for_ambient_noise(source, duration=0.2)
+
+            # Capture audio - this will wait for speech and record it
+            audio = recognizer.listen(
+                source,
+                timeout=1,  # Start listening within 1 second
+                phrase_time_limit=10  # Max 10 seconds of speech
+            )
+
+        # Audio captured! Now wait a moment for key release if still held
+        time.sleep(0.1)
+        self.is_recording = False
+        return audio
+
     def screenshot_and_respond(self):
         """Take screenshot and get AI response"""
         if not self.engine.is_running:
@@ -3614,15 +3653,12 @@ TWITCH_OAUTH_TOKEN=
 
         def screenshot_thread():
             try:
-                from input_handlers import ScreenCaptureHandler
-                screen_handler = ScreenCaptureHandler()
-                screen_data = screen_handler.capture_screen()
+                screen_data = self.engine.inputs.screen.capture_screen()
 
                 if screen_data:
                     model = self.config['llm_model']
-                    vision_models = ['gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo']
 
-                    if model not in vision_models:
+                    if not self.engine.llm.vision_model() and not self.engine.inputs.screen.ocr_enabled:
                         self.add_chat_message(
                             "System",
                             f"⚠️ Your model '{model}' doesn't support vision. Please switch to gpt-4o in Setup tab."
@@ -3678,7 +3714,8 @@ TWITCH_OAUTH_TOKEN=
 
                     llm = LLMManager(
                         model=self.config['llm_model'],
-                        system_prompt=system_prompt
+                        system_prompt=system_prompt,
+                        endpoints=self.config.get('llm_endpoints', [])
                     )
 
                     response_length = self.config.get('response_length', 'normal')
@@ -3777,7 +3814,8 @@ TWITCH_OAUTH_TOKEN=
                     )
                     return
 
-                llm = LLMManager(model=self.config['llm_model'], system_prompt="You are a helpful assistant.")
+                llm = LLMManager(model=self.config['llm_model'], system_prompt="You are a helpful assistant.",
+                                 endpoints=self.config.get('llm_endpoints', []))
                 response = llm.chat("Say 'Connection successful!' and nothing else.")
 
                 if response and len(response) > 0:
@@ -1,39 +1,215 @@
 ﻿import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from openai import OpenAI
 from groq import Groq
 import tiktoken
+from collections import OrderedDict
+from image_pipeline import image_content_part, image_tokens
+
+
+GROQ_MODEL_PREFIXES = ('llama', 'mixtral', 'gemma', 'qwen', 'moonshotai', 'openai/')
+
+
+def is_groq_model(model):
+    """Check whether a model name is served by Groq rather than OpenAI"""
+    return model.startswith(GROQ_MODEL_PREFIXES)
+
+
+# What each model can do: vision = accepts images, tier = 'fast' (small, cheap, quick)
+# or 'large' (slower, better at long or tricky prompts)
+MODEL_CAPABILITIES = {
+    'gpt-4o': {'vision': True, 'tier': 'large'},
+    'gpt-4o-mini': {'vision': True, 'tier': 'fast'},
+    'gpt-4-turbo': {'vision': True, 'tier': 'large'},
+    'gpt-4': {'vision': False, 'tier': 'large'},
+    'llama-3.1-8b-instant': {'vision': False, 'tier': 'fast'},
+    'llama-3.3-70b-versatile': {'vision': False, 'tier': 'large'},
+    'moonshotai/kimi-k2-instruct-0905': {'vision': False, 'tier': 'large'},
+}
+
+
+def supports_vision(model):
+    """Check whether a model accepts image input"""
+    return MODEL_CAPABILITIES.get(model, {}).get('vision', False)
+
+
+def model_tier(model):
+    """Get a model's tier ('fast' or 'large'); unknown models count as large"""
+    return MODEL_CAPABILITIES.get(model, {}).get('tier', 'large')
+
+
+def register_model(model, vision=False, tier='large'):
+    """Add (or update) a model in the capability table"""
+    MODEL_CAPABILITIES[model] = {'vision': vision, 'tier': tier}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would exceed the provider's rate limit and can't wait long enough"""
+
+
+def _parse_reset(value):
+    """Parse a rate-limit reset duration like '1s', '6m0s', '20ms' or '1h2m3.5s' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value):
+        total += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return total
+
+
+class RateLimiter:
+    def __init__(self, max_wait=10.0):
+        """Client-side request/token buckets per model, refilled from OpenAI/Groq rate-limit headers"""
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, model):
+        """Get the bucket state for a model"""
+        if model not in self.buckets:
+            self.buckets[model] = {
+                'requests': None, 'tokens': None,
+                'requests_limit': None, 'tokens_limit': None,
+                'requests_reset_at': 0.0, 'tokens_reset_at': 0.0,
+                'blocked_until': 0.0
+            }
+        return self.buckets[model]
+
+    def _refill(self, bucket, now):
+        """Restore the buckets whose reset time has passed"""
+        if bucket['requests'] is not None and now >= bucket['requests_reset_at']:
+            bucket['requests'] = bucket['requests_limit']
+        if bucket['tokens'] is not None and now >= bucket['tokens_reset_at']:
+            bucket['tokens'] = bucket['tokens_limit']
+
+    def acquire(self, model, tokens):
+        """Wait until a request of this many tokens fits, then reserve it
+
+        Raises RateLimitExceeded if that would mean waiting longer than max_wait.
+        """
+        while True:
+            with self.lock:
+                bucket = self._bucket(model)
+                now = time.time()
+                self._refill(bucket, now)
+
+                wait = max(0.0, bucket['blocked_until'] - now)
+                if bucket['requests'] is not None and bucket['requests'] <= 0:
+                    wait = max(wait, bucket['requests_reset_at'] - now)
+                if bucket['tokens'] is not None and bucket['tokens'] < tokens:
+                    wait = max(wait, bucket['tokens_reset_at'] - now)
+
+                if wait <= 0:
+                    if bucket['requests'] is not None:
+                        bucket['requests'] -= 1
+                    if bucket['tokens'] is not None:
+                        bucket['tokens'] -= tokens
+                    return
+
+            if wait > self.max_wait:
+                raise RateLimitExceeded(f"Rate limit reached for {model}, resets in {wait:.0f}s")
+            time.sleep(wait)
+
+    def update_from_headers(self, model, headers):
+        """Sync a model's buckets with the x-ratelimit-* headers of a response"""
+        if not headers:
+            return
+
+        now = time.time()
+        with self.lock:
+            bucket = self._bucket(model)
+            for kind in ('requests', 'tokens'):
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                limit = headers.get(f'x-ratelimit-limit-{kind}')
+                reset = _parse_reset(headers.get(f'x-ratelimit-reset-{kind}'))
+
+                try:
+                    if remaining is not None:
+                        bucket[kind] = float(remaining)
+                    if limit is not None:
+                        bucket[f'{kind}_limit'] = float(limit)
+                except ValueError:
+                    continue
+                if reset is not None:
+                    bucket[f'{kind}_reset_at'] = now + reset
+
+    def block(self, model, seconds):
+        """Hold all requests for a model (after a 429 with retry-after)"""
+        with self.lock:
+            bucket = self._bucket(model)
+            bucket['blocked_until'] = max(bucket['blocked_until'], time.time() + seconds)
 
 
 class LLMManager:
-    def __init__(self, model='gpt-4o', system_prompt='You are a helpful assistant.', max_tokens=8000):
-        """Initialize LLM manager with specified model (OpenAI or Groq)"""
+    def __init__(self, model='gpt-4o', system_prompt='You are a helpful assistant.', max_tokens=8000,
+                 endpoints=None):
+        """Initialize LLM manager with specified model (OpenAI, Groq or an OpenAI-compatible endpoint)
+
+        endpoints is a list of extra OpenAI-compatible servers, each a dict with
+        'name', 'base_url', 'api_key_env', 'models' and optional 'capabilities'
+        ({model: {'vision': bool, 'tier': 'fast'|'large'}}). An endpoint with
+        'model_path' instead of 'base_url' runs a GGUF model in-process through
+        llama-cpp-python (optional 'n_ctx', 'n_threads', 'chat_format').
+        """
         self.model = model
         self.chat_history = []
         self.max_tokens = max_tokens
 
+        # Pace requests to stay under the provider's limits instead of hitting 429s
+        self.rate_limiter = RateLimiter()
+        self.max_retries = 2
+
+        # One shared client (and connection pool) per provider or endpoint
+        self.endpoints = []
+        self.clients = {}
+        self.local_models = {}
+        self.set_endpoints(endpoints)
+
         # Determine if using Groq or OpenAI
-        self.is_groq = (model.startswith('llama') or
-                        model.startswith('mixtral') or
-                        model.startswith('gemma') or
-                        model.startswith('qwen') or
-                        model.startswith('moonshotai') or
-                        model.startswith('openai/'))
-
-        if self.is_groq:
-            self.client = Groq(api_key=os.getenv('GROQ_API_KEY'))
-        else:
-            self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.is_groq = is_groq_model(model) and not self._endpoint_for(model)
+        self.client = self._client_for(model)
+
+        # Failover: a fallback model used on error/timeout, and optionally raced against
+        # the primary when it hasn't produced a first token within hedge_after seconds
+        self.fallback_model = None
+        self.request_timeout = 30.0
+        self.hedge_after = None
+        self.pool = ThreadPoolExecutor(max_workers=4)
+
+        # Routing: pick a model per request from MODEL_CAPABILITIES and recent latency
+        self.routing_enabled = False
+        self.routing_models = []
+        self.long_prompt_words = 40
+        self.latencies = {}
+        self.latency_lock = threading.Lock()
+
+        # Images are swapped out of history once answered; the raw data URLs are kept
+        # here (oldest dropped past image_store_limit bytes) in case they're needed again
+        self.image_history_mode = 'description'
+        self.image_store = OrderedDict()
+        self.image_store_limit = 20 * 1024 * 1024
+        self.image_counter = 0
 
         if system_prompt:
             self.chat_history.append({
                 "role": "system",
                 "content": system_prompt
             })
+        self._prime_local()
 
     def count_tokens(self, messages):
         """Count tokens in message list"""
-        if self.is_groq:
-            # Rough estimate for Groq models
+        if self.is_groq or self._endpoint_for(self.model):
+            # Rough estimate for Groq and self-hosted models
             total = 0
             for msg in messages:
                 content = msg.get('content', '')
@@ -43,6 +219,8 @@ class LLMManager:
                     for item in content:
                         if item.get("type") == "text":
                             total += len(item.get("text", "").split()) * 1.3
+                        elif item.get("type") == "image_url":
+                            total += image_tokens(item)
             return int(total)
 
         try:
@@ -57,7 +235,7 @@ class LLMManager:
                                 if item.get("type") == "text":
                                     num_tokens += len(encoding.encode(item.get("text", "")))
                                 elif item.get("type") == "image_url":
-                                    num_tokens += 255
+                                    num_tokens += image_tokens(item)
                         else:
                             num_tokens += len(encoding.encode(str(value)))
                     else:
@@ -77,30 +255,251 @@ class LLMManager:
             else:
                 break
 
-    def chat(self, user_message, temperature=0.7, max_response_tokens=150, image_path=None):
-        """Send a message and get response"""
-
-        # Handle vision for OpenAI only
-        if image_path and not self.is_groq:
-            return self.chat_with_vision(user_message, image_path, temperature, max_response_tokens)
+    def _retry_after(self, error):
+        """Get the retry-after delay from a 429 error, if the provider sent one"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        delay = _parse_reset(headers.get('retry-after-ms'))
+        if delay is not None:
+            return delay / 1000.0
+        return _parse_reset(headers.get('retry-after'))
+
+    def _create_completion(self, messages, temperature, max_response_tokens, needs_vision=False, model=None):
+        """Get a reply from the given (or primary) model, failing over to the fallback model on error or timeout"""
+        models = [model or self.model]
+        if self.fallback_model and self.fallback_model != models[0]:
+            if not needs_vision or supports_vision(self.fallback_model):
+                models.append(self.fallback_model)
+
+        if self.hedge_after and len(models) > 1:
+            return self._hedged_completion(models[0], models[1], messages, temperature, max_response_tokens)
+
+        for i, model in enumerate(models):
+            try:
+                return self._complete_with_model(model, messages, temperature, max_response_tokens)
+            except Exception:
+                if i == len(models) - 1:
+                    raise
+
+    def _hedged_completion(self, primary, backup, messages, temperature, max_response_tokens):
+        """Race the backup model against a primary that is slow to produce its first token"""
+        first_token = {primary: threading.Event(), backup: threading.Event()}
+        cancel = {primary: threading.Event(), backup: threading.Event()}
+
+        def run(model):
+            return self._complete_with_model(model, messages, temperature, max_response_tokens,
+                                             first_token[model], cancel[model])
+
+        primary_future = self.pool.submit(run, primary)
+        pending = {primary_future: primary}
+
+        # Give the primary hedge_after seconds to start answering (or fail outright)
+        waited_until = time.time() + self.hedge_after
+        while not first_token[primary].is_set() and not primary_future.done() and time.time() < waited_until:
+            first_token[primary].wait(0.02)
+
+        failed_primary = primary_future.done() and primary_future.exception() is not None
+        if not first_token[primary].is_set() or failed_primary:
+            pending[self.pool.submit(run, backup)] = backup
+
+        # First complete answer wins; the other stream is told to stop
+        error = None
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                model = pending.pop(future)
+                if future.exception() is None:
+                    for other in pending.values():
+                        cancel[other].set()
+                    return future.result()
+                error = future.exception()
+
+        raise error
+
+    def _complete_with_model(self, model, messages, temperature, max_response_tokens,
+                             first_token=None, cancel=None):
+        """Send a chat completion request to one model, paced by the rate limiter, and return the reply text
+
+        With first_token, the reply is streamed and the event is set when the first token arrives;
+        setting cancel stops reading the stream early. A 429 is retried with retry-after-aware
+        backoff; if it persists RateLimitExceeded is raised.
+        """
+        endpoint = self._endpoint_for(model)
+        if endpoint and endpoint.get('model_path'):
+            start = time.time()
+            try:
+                reply = self._local_for(endpoint).complete(messages, temperature, max_response_tokens,
+                                                           first_token, cancel)
+            except Exception:
+                self._record_latency(model, self.request_timeout)
+                raise
+            self._record_latency(model, time.time() - start)
+            return reply
+
+        client = self._client_for(model)
+        estimated_tokens = self.count_tokens(messages) + max_response_tokens
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(model, estimated_tokens)
+            start = time.time()
+
+            try:
+                raw = client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_response_tokens,
+                    timeout=self.request_timeout,
+                    stream=first_token is not None
+                )
+            except Exception as e:
+                if getattr(e, 'status_code', None) != 429:
+                    # Count errors as slow so the router steers away from a failing model
+                    self._record_latency(model, self.request_timeout)
+                    raise
+
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = 2 ** attempt
+                self.rate_limiter.block(model, delay)
+
+                if attempt == self.max_retries:
+                    raise RateLimitExceeded(f"Rate limit reached for {model}: {e}")
+                continue
+
+            self.rate_limiter.update_from_headers(model, raw.headers)
+            response = raw.parse()
+
+            if first_token is None:
+                self._record_latency(model, time.time() - start)
+                return response.choices[0].message.content
+
+            parts = []
+            for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    response.close()
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not parts:
+                        self._record_latency(model, time.time() - start)
+                    first_token.set()
+                    parts.append(chunk.choices[0].delta.content)
+            return ''.join(parts)
+
+    def _record_latency(self, model, seconds):
+        """Keep the last few response times for a model"""
+        with self.latency_lock:
+            self.latencies.setdefault(model, deque(maxlen=20)).append(seconds)
+
+    def get_latency(self, model):
+        """Get a model's median recent response time, or None if it hasn't been used yet"""
+        with self.latency_lock:
+            samples = sorted(self.latencies.get(model, ()))
+        if not samples:
+            return None
+        return samples[len(samples) // 2]
+
+    def set_routing(self, enabled=False, models=None, long_prompt_words=40):
+        """Configure per-request model routing
+
+        models limits the candidates (empty = every model in MODEL_CAPABILITIES whose API key is set);
+        prompts of at least long_prompt_words words, or with several questions, go to a large model.
+        """
+        self.routing_enabled = enabled
+        self.routing_models = list(models or [])
+        self.long_prompt_words = long_prompt_words
+
+    def _has_credentials(self, model):
+        """Check whether the API key a model needs is configured"""
+        endpoint = self._endpoint_for(model)
+        if endpoint:
+            return not endpoint.get('api_key_env') or bool(os.getenv(endpoint['api_key_env']))
+        return bool(os.getenv('GROQ_API_KEY' if is_groq_model(model) else 'OPENAI_API_KEY'))
+
+    def _routing_candidates(self):
+        """Get the models the router may pick from"""
+        models = self.routing_models or list(MODEL_CAPABILITIES)
+        candidates = [model for model in models if self._has_credentials(model)]
+        if self.model not in candidates:
+            candidates.append(self.model)
+        return candidates
+
+    def _fastest(self, models):
+        """Pick the model with the lowest recent latency; untried models go first so they get measured"""
+        return min(models, key=lambda model: self.get_latency(model) or 0.0)
+
+    def route(self, user_message, has_image=False):
+        """Pick the model for a request
+
+        Images go to a vision model, long or question-heavy prompts to a large model and
+        everything else to the fastest small model. The configured model is kept whenever it
+        already fits the request; with routing off it is always used.
+        """
+        if not self.routing_enabled:
+            return self.model
+
+        candidates = self._routing_candidates()
+        text = user_message if isinstance(user_message, str) else ''
+
+        if has_image:
+            if supports_vision(self.model):
+                return self.model
+            vision = [model for model in candidates if supports_vision(model)]
+            return self._fastest(vision) if vision else self.model
+
+        if len(text.split()) >= self.long_prompt_words or text.count('?') >= 2:
+            if model_tier(self.model) == 'large':
+                return self.model
+            large = [model for model in candidates if model_tier(model) == 'large']
+            return self._fastest(large) if large else self.model
+
+        fast = [model for model in candidates if model_tier(model) == 'fast']
+        return self._fastest(fast) if fast else self.model
+
+    def vision_model(self):
+        """Get the model that would answer a request with an image, or None if none can"""
+        model = self.route('', has_image=True)
+        return model if supports_vision(model) else None
+
+    def _request_messages(self, instructions=None):
+        """Build the messages for a request, adding one-off instructions that aren't kept in history"""
+        if not instructions:
+            return self.chat_history
+        return self.chat_history + [{
+            "role": "system",
+            "content": instructions
+        }]
+
+    def chat(self, user_message, temperature=0.7, max_response_tokens=150, image=None, instructions=None,
+             history_message=None, model=None):
+        """Send a message and get response
+
+        If history_message is given it replaces user_message in the history once the request is sent,
+        and the prompt is dropped from the history if the request fails.
+        model overrides the configured/routed model for this request.
+        """
+
+        if image and self.vision_model():
+            return self.chat_with_vision(user_message, image, temperature, max_response_tokens, instructions)
+
+        model = model or self.route(user_message)
 
         # Regular text chat
-        self.chat_history.append({
+        user_entry = {
             "role": "user",
             "content": user_message
-        })
+        }
+        self.chat_history.append(user_entry)
 
         self.manage_context()
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.chat_history,
-                temperature=temperature,
-                max_tokens=max_response_tokens
+            assistant_message = self._create_completion(
+                self._request_messages(instructions), temperature, max_response_tokens, model=model
             )
 
-            assistant_message = response.choices[0].message.content
+            if history_message:
+                user_entry["content"] = history_message
 
             self.chat_history.append({
                 "role": "assistant",
@@ -109,50 +508,58 @@ class LLMManager:
 
             return assistant_message
 
+        except RateLimitExceeded:
+            # Let the engine answer with its rate-limit line instead of speaking the error
+            if history_message:
+                self._remove_history_entry(user_entry)
+            raise
+
         except Exception as e:
+            if history_message:
+                self._remove_history_entry(user_entry)
             error_msg = f"Error getting response: {e}"
             return error_msg
 
-    def chat_with_vision(self, user_message, image_path, temperature=0.7, max_response_tokens=150):
-        """Send message with image (OpenAI only)"""
-        if self.is_groq:
-            return "Vision not supported with Groq models. Use OpenAI GPT-4o for vision."
+    def _remove_history_entry(self, entry):
+        """Drop one message from the history (it may already have been trimmed away)"""
+        for i, message in enumerate(self.chat_history):
+            if message is entry:
+                del self.chat_history[i]
+                return
 
-        import base64
+    def chat_with_vision(self, user_message, image, temperature=0.7, max_response_tokens=150, instructions=None):
+        """Send message with image (vision-capable models only)
 
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        image can be an EncodedImage from the image pipeline, raw bytes, a PIL image,
+        a data URL or a file path.
+        """
+        model = self.vision_model()
+        if not model:
+            return f"Vision not supported with {self.model}. Use OpenAI GPT-4o for vision."
 
         content = [
             {
                 "type": "text",
                 "text": user_message
             },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
-                }
-            }
+            image_content_part(image)
         ]
 
-        self.chat_history.append({
+        user_entry = {
             "role": "user",
             "content": content
-        })
+        }
+        self.chat_history.append(user_entry)
 
         self.manage_context()
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.chat_history,
-                temperature=temperature,
-                max_tokens=max_response_tokens
+            assistant_message = self._create_completion(
+                self._request_messages(instructions), temperature, max_response_tokens, needs_vision=True,
+                model=model
             )
 
-            assistant_message = response.choices[0].message.content
-
+            self._strip_images(user_entry, assistant_message)
             self.chat_history.append({
                 "role": "assistant",
                 "content": assistant_message
@@ -160,10 +567,59 @@ class LLMManager:
 
             return assistant_message
 
+        except RateLimitExceeded:
+            self._strip_images(user_entry)
+            raise
+
         except Exception as e:
+            self._strip_images(user_entry)
             error_msg = f"Error getting vision response: {e}"
             return error_msg
 
+    def set_image_history(self, mode='description', store_limit_mb=20):
+        """Choose what replaces answered images in history ('description' or 'placeholder') and the side store size"""
+        self.image_history_mode = mode
+        self.image_store_limit = int(store_limit_mb * 1024 * 1024)
+        self._trim_image_store()
+
+    def _strip_images(self, entry, reply=None):
+        """Replace the images in a history entry with a short text note, keeping the data in the side store
+
+        With mode 'description' the note carries the first sentence of the model's reply.
+        """
+        if not isinstance(entry.get("content"), list):
+            return
+
+        parts = []
+        for item in entry["content"]:
+            if item.get("type") != "image_url":
+                parts.append(item)
+                continue
+
+            self.image_counter += 1
+            if self.image_store_limit > 0:
+                self.image_store[self.image_counter] = item["image_url"]["url"]
+
+            note = f"[image #{self.image_counter}]"
+            if reply and self.image_history_mode == 'description':
+                summary = re.split(r'(?<=[.!?])\s', reply.strip(), maxsplit=1)[0][:150]
+                note = f"[image #{self.image_counter}: {summary}]"
+            parts.append({"type": "text", "text": note})
+
+        entry["content"] = "\n".join(part.get("text", "") for part in parts)
+        self._trim_image_store()
+
+    def _trim_image_store(self):
+        """Drop the oldest stored images past the size limit"""
+        total = sum(len(url) for url in self.image_store.values())
+        while self.image_store and total > self.image_store_limit:
+            _, url = self.image_store.popitem(last=False)
+            total -= len(url)
+
+    def get_stored_image(self, image_id):
+        """Get the data URL of an image stripped from history, if it's still stored"""
+        return self.image_store.get(image_id)
+
     def reset_conversation(self, system_prompt=None):
         """Reset conversation history"""
         self.chat_history = []
@@ -176,12 +632,86 @@ class LLMManager:
     def set_model(self, model):
         """Change the LLM model"""
         self.model = model
-        self.is_groq = model.startswith('llama') or model.startswith('mixtral') or model.startswith('gemma')
-
-        if self.is_groq:
-            self.client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+        self.is_groq = is_groq_model(model) and not self._endpoint_for(model)
+        self.client = self._client_for(model)
+        self._prime_local()
+
+    def set_endpoints(self, endpoints=None):
+        """Replace the configured OpenAI-compatible endpoints and register their models' capabilities"""
+        for endpoint in self.endpoints:
+            self.clients.pop(('endpoint', self._endpoint_key(endpoint)), None)
+
+        self.endpoints = [endpoint for endpoint in (endpoints or [])
+                          if endpoint.get('base_url') or endpoint.get('model_path')]
+        for endpoint in self.endpoints:
+            capabilities = endpoint.get('capabilities', {})
+            for model in endpoint.get('models', []):
+                register_model(model, **capabilities.get(model, {}))
+
+    def _endpoint_key(self, endpoint):
+        """Get the name a configured endpoint's client is stored under"""
+        return endpoint.get('name') or endpoint.get('base_url') or endpoint['model_path']
+
+    def _local_for(self, endpoint):
+        """Get the embedded model for an endpoint, loading it on first use"""
+        key = self._endpoint_key(endpoint)
+        if key not in self.local_models:
+            from local_llm import LocalLLM
+            self.local_models[key] = LocalLLM(
+                endpoint['model_path'],
+                n_ctx=endpoint.get('n_ctx', 2048),
+                n_threads=endpoint.get('n_threads'),
+                chat_format=endpoint.get('chat_format')
+            )
+        return self.local_models[key]
+
+    def _prime_local(self):
+        """Load an embedded model and cache the system prompt in the background"""
+        endpoint = self._endpoint_for(self.model)
+        if not endpoint or not endpoint.get('model_path'):
+            return
+        if not self.chat_history or self.chat_history[0]["role"] != "system":
+            return
+
+        system_prompt = self.chat_history[0]["content"]
+        self.pool.submit(lambda: self._local_for(endpoint).prime(system_prompt))
+
+    def _endpoint_for(self, model):
+        """Get the configured endpoint that serves a model, if any"""
+        for endpoint in self.endpoints:
+            if model in endpoint.get('models', []):
+                return endpoint
+        return None
+
+    def set_fallback(self, fallback_model=None, request_timeout=30.0, hedge_after=None):
+        """Configure the fallback model, per-request timeout and hedging threshold (None = no hedging)"""
+        self.fallback_model = fallback_model or None
+        self.request_timeout = request_timeout
+        self.hedge_after = hedge_after or None
+
+    def _client_for(self, model):
+        """Get the shared client for the provider or endpoint that serves a model"""
+        endpoint = self._endpoint_for(model)
+        if endpoint and endpoint.get('model_path'):
+            # Embedded models run in-process, no client needed
+            return None
+        if endpoint:
+            provider = ('endpoint', self._endpoint_key(endpoint))
         else:
-            self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            provider = 'groq' if is_groq_model(model) else 'openai'
+
+        if provider not in self.clients:
+            # Retries are handled here (429 backoff, fallback model) rather than inside the SDK
+            if endpoint:
+                # Local servers usually ignore the key, but the SDK insists on one
+                api_key = os.getenv(endpoint['api_key_env']) if endpoint.get('api_key_env') else None
+                self.clients[provider] = OpenAI(base_url=endpoint['base_url'], api_key=api_key or 'not-needed',
+                                                max_retries=0)
+            elif provider == 'groq':
+                self.clients[provider] = Groq(api_key=os.getenv('GROQ_API_KEY'), max_retries=0)
+            else:
+                self.clients[provider] = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+        return self.clients[provider]
 
     def set_system_prompt(self, prompt):
         """Update system prompt"""
@@ -192,6 +722,7 @@ class LLMManager:
                 "role": "system",
                 "content": prompt
             })
+        self._prime_local()
 
     def get_history(self):
         """Get current conversation history"""
@@ -199,7 +730,11 @@ class LLMManager:
 
     def load_history(self, history):
         """Load conversation history"""
-        self.chat_history = history.copy()
+        self.chat_history = [dict(entry) for entry in history]
+
+        # Older history files kept every screenshot inline
+        for entry in self.chat_history:
+            self._strip_images(entry)
 
 
 if __name__ == '__main__':
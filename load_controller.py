@@ -0,0 +1,128 @@
+﻿"""
+Load Controller - Adapts reply length and Twitch cooldown to chat activity
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+
+class LoadController:
+    def __init__(self, window=60.0, busy_rate=20.0, max_queue=4, rise_time=2.0, fall_time=20.0):
+        """Track ingest rate, queue depth and stage latency over a rolling window
+
+        busy_rate is the number of chat messages per minute that counts as a
+        fully busy chat; max_queue is the backlog of replies that counts as
+        fully loaded. Pressure follows its target with a time constant of
+        rise_time seconds when load grows and fall_time seconds when it eases.
+        """
+        self.window = window
+        self.busy_rate = busy_rate
+        self.max_queue = max_queue
+        self.rise_time = rise_time
+        self.fall_time = fall_time
+
+        self.ingest_times = deque()
+        self.latencies = {}
+        self.queue_depth = 0
+        self.pressure = 0.0
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    def record_ingest(self):
+        """Record one incoming chat message"""
+        with self.lock:
+            self.ingest_times.append(time.time())
+            self._trim(self.ingest_times)
+
+    def record_latency(self, stage, seconds):
+        """Record how long a pipeline stage (llm, synthesis, playback) took"""
+        with self.lock:
+            samples = self.latencies.setdefault(stage, deque())
+            samples.append((time.time(), seconds))
+            self._trim(samples, key=lambda sample: sample[0])
+
+    def set_queue_depth(self, depth):
+        """Update the number of replies waiting to be generated or spoken"""
+        with self.lock:
+            self.queue_depth = depth
+
+    def _trim(self, samples, key=lambda sample: sample):
+        """Drop samples older than the rolling window"""
+        cutoff = time.time() - self.window
+        while samples and key(samples[0]) < cutoff:
+            samples.popleft()
+
+    def get_ingest_rate(self):
+        """Get chat messages per minute over the window"""
+        with self.lock:
+            self._trim(self.ingest_times)
+            return len(self.ingest_times) * 60.0 / self.window
+
+    def get_service_time(self):
+        """Get the average seconds spent per reply across all stages"""
+        with self.lock:
+            total = 0.0
+            for samples in self.latencies.values():
+                self._trim(samples, key=lambda sample: sample[0])
+                if samples:
+                    total += sum(seconds for _, seconds in samples) / len(samples)
+            return total
+
+    def update(self):
+        """Recompute load pressure (0.0 = calm, 1.0 = overloaded)"""
+        rate = self.get_ingest_rate()
+        service_time = self.get_service_time()
+
+        # Utilisation: share of each minute we'd spend answering if we replied to everything
+        utilisation = rate * service_time / 60.0 if service_time else rate / self.busy_rate
+
+        with self.lock:
+            backlog = self.queue_depth / self.max_queue
+            target = max(0.0, min(1.0, max(utilisation, backlog)))
+
+            # Tighten quickly, relax slowly so settings don't flap. Smoothing is per
+            # second rather than per call, so pressure eases off even when chat goes quiet.
+            now = time.time()
+            elapsed, self.updated_at = now - self.updated_at, now
+            time_constant = self.rise_time if target > self.pressure else self.fall_time
+            self.pressure += (target - self.pressure) * (1.0 - math.exp(-elapsed / time_constant))
+            return self.pressure
+
+    def get_pressure(self):
+        """Get the current load pressure"""
+        return self.update()
+
+    def max_tokens(self, base, floor=40):
+        """Scale the reply token budget down as load rises"""
+        floor = min(base, floor)
+        return int(round(base - (base - floor) * self.get_pressure()))
+
+    def cooldown(self, base):
+        """Match the Twitch cooldown to how fast replies are actually being spoken
+
+        When calm this is the configured cooldown. Under load it moves toward the
+        time one reply takes plus the time to clear the current backlog, so short
+        replies open up more slots and a growing backlog closes them.
+        """
+        pressure = self.get_pressure()
+        service_time = self.get_service_time()
+        if not service_time:
+            return base
+
+        with self.lock:
+            queue_depth = self.queue_depth
+
+        target = service_time * (1 + queue_depth)
+        target = max(min(base, 2.0), min(target, base * 3))
+        return base + (target - base) * pressure
+
+    def brevity_instruction(self):
+        """Get an extra instruction asking for shorter replies, or None when calm"""
+        pressure = self.get_pressure()
+        if pressure >= 0.6:
+            return "Chat is very busy right now: reply in one short sentence."
+        if pressure >= 0.3:
+            return "Chat is busy right now: keep this reply short."
+        return None
@@ -0,0 +1,124 @@
+﻿"""
+Local LLM - In-process GGUF models (llama-cpp-python) with the system prompt kept in the KV cache
+"""
+
+import os
+import threading
+
+try:
+    from llama_cpp import Llama, LlamaRAMCache
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+    print("llama-cpp-python not installed. Embedded models disabled. Install with: pip install llama-cpp-python")
+
+
+# Loaded models are shared so reinitializing the engine doesn't reload them from disk
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+class LocalLLM:
+    def __init__(self, model_path, n_ctx=2048, n_threads=None, chat_format=None, cache_bytes=256 << 20):
+        """Wrap a GGUF model loaded once and reused across turns
+
+        llama.cpp only evaluates tokens past the longest prefix it already has in its
+        KV cache, so as long as the system prompt stays first every turn skips
+        re-reading it. The RAM cache keeps states for a few recent prompts too.
+        """
+        if not LLAMA_CPP_AVAILABLE:
+            raise RuntimeError("llama-cpp-python is not installed")
+
+        key = (os.path.abspath(model_path), n_ctx, chat_format)
+        with _MODELS_LOCK:
+            if key not in _MODELS:
+                model = Llama(
+                    model_path=model_path,
+                    n_ctx=n_ctx,
+                    n_threads=n_threads or max(1, (os.cpu_count() or 2) - 1),
+                    chat_format=chat_format,
+                    verbose=False
+                )
+                model.set_cache(LlamaRAMCache(capacity_bytes=cache_bytes))
+                _MODELS[key] = (model, threading.Lock())
+
+        self.model, self.lock = _MODELS[key]
+        self.primed_prompt = None
+
+    def prime(self, system_prompt):
+        """Evaluate the system prompt ahead of time so the first reply doesn't pay for it"""
+        if not system_prompt or system_prompt == self.primed_prompt:
+            return
+
+        with self.lock:
+            self.model.create_chat_completion(
+                messages=[{"role": "system", "content": system_prompt}],
+                max_tokens=1
+            )
+        self.primed_prompt = system_prompt
+
+    def complete(self, messages, temperature=0.7, max_tokens=150, first_token=None, cancel=None):
+        """Generate a reply, streaming tokens so first_token fires early and cancel can stop it"""
+        with self.lock:
+            stream = self.model.create_chat_completion(
+                messages=_template_safe(_text_only(messages)),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+
+            parts = []
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    stream.close()
+                    break
+                content = chunk['choices'][0]['delta'].get('content') if chunk['choices'] else None
+                if content:
+                    if first_token is not None:
+                        first_token.set()
+                    parts.append(content)
+            return ''.join(parts).strip()
+
+
+def _text_only(messages):
+    """Flatten multi-part message content to its text (embedded models here don't take images)"""
+    flattened = []
+    for message in messages:
+        content = message.get('content', '')
+        if isinstance(content, list):
+            content = ' '.join(item.get('text', '') for item in content if item.get('type') == 'text')
+        flattened.append({"role": message['role'], "content": content})
+    return flattened
+
+
+def _template_safe(messages):
+    """Reshape messages for strict GGUF chat templates (Mistral/Gemma-style)
+
+    Those templates reject a system message anywhere but first and roles that don't
+    alternate, so later system messages (one-off instructions) are folded into the
+    last user message and consecutive messages from the same role are merged.
+    """
+    leading = []
+    while len(leading) < len(messages) and messages[len(leading)]['role'] == 'system':
+        leading.append(messages[len(leading)]['content'])
+
+    turns = []
+    late_instructions = []
+    for message in messages[len(leading):]:
+        if message['role'] == 'system':
+            late_instructions.append(message['content'])
+        elif turns and turns[-1]['role'] == message['role']:
+            turns[-1]['content'] += f"\n\n{message['content']}"
+        else:
+            turns.append(dict(message))
+
+    if late_instructions:
+        for turn in reversed(turns):
+            if turn['role'] == 'user':
+                turn['content'] += '\n\n' + '\n'.join(late_instructions)
+                break
+        else:
+            leading += late_instructions
+
+    system = [{"role": "system", "content": '\n\n'.join(leading)}] if leading else []
+    return system + turns
@@ -0,0 +1,177 @@
+﻿"""
+Microphone Stream - One always-open input stream with a pre-roll ring buffer
+"""
+
+import threading
+import time
+from collections import deque
+import numpy as np
+import speech_recognition as sr
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+    print("PyAudio not installed. Microphone stream disabled. Install with: pip install pyaudio")
+
+
+def frame_rms(frame):
+    """RMS level of a 16-bit PCM frame, 0.0-1.0"""
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    if not len(samples):
+        return 0.0
+    return float(np.sqrt(np.mean(samples * samples))) / 32768.0
+
+
+class MicrophoneStream:
+    def __init__(self, sample_rate=16000, frame_ms=30, preroll=0.5, max_seconds=30, device_index=None):
+        """Keep the microphone open and remember the last preroll seconds
+
+        Frames are 16-bit mono PCM of frame_ms each. Push-to-talk calls
+        begin_utterance() on key press (the utterance starts preroll seconds
+        earlier, so first syllables aren't clipped) and end_utterance() on release.
+        Other components can subscribe to every frame with add_listener().
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = int(sample_rate * frame_ms / 1000)
+        self.frame_seconds = self.frame_samples / sample_rate
+        self.device_index = device_index
+
+        self.ring = deque(maxlen=max(1, int(preroll / self.frame_seconds)))
+        self.max_frames = int(max_seconds / self.frame_seconds)
+        self.utterance = None
+        self.utterance_listener = None
+        self.lock = threading.Lock()
+
+        # Ambient level, an EMA of frame RMS updated while not recording. It falls quickly
+        # and rises slowly so speech between turns doesn't drag it up.
+        self.ambient_rms = None
+        self.ambient_fall = 0.05
+        self.ambient_rise = 0.002
+
+        self.listeners = []
+        self.audio = None
+        self.stream = None
+
+    def start(self):
+        """Open the input stream (returns False if no microphone is available)"""
+        if self.stream or not PYAUDIO_AVAILABLE:
+            return bool(self.stream)
+
+        try:
+            self.audio = pyaudio.PyAudio()
+            self.stream = self.audio.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=self.sample_rate,
+                input=True,
+                input_device_index=self.device_index,
+                frames_per_buffer=self.frame_samples,
+                stream_callback=self._stream_callback
+            )
+            self.stream.start_stream()
+            return True
+
+        except Exception as e:
+            print(f"[Mic] Could not open microphone: {e}")
+            self.stop()
+            return False
+
+    def stop(self):
+        """Close the input stream"""
+        try:
+            if self.stream:
+                self.stream.stop_stream()
+                self.stream.close()
+            if self.audio:
+                self.audio.terminate()
+        except Exception:
+            pass
+        self.stream = None
+        self.audio = None
+
+    def is_open(self):
+        """Check whether the stream is running"""
+        return self.stream is not None
+
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """PyAudio callback: hand each buffer to feed()"""
+        self.feed(in_data)
+        return None, pyaudio.paContinue
+
+    def feed(self, frame):
+        """Process one frame of 16-bit mono PCM (called by the stream, or directly with recorded audio)"""
+        level = frame_rms(frame)
+
+        with self.lock:
+            self.ring.append(frame)
+            if self.utterance is not None:
+                if len(self.utterance) < self.max_frames:
+                    self.utterance.append(frame)
+            elif self.ambient_rms is None:
+                self.ambient_rms = level
+            else:
+                alpha = self.ambient_rise if level > self.ambient_rms else self.ambient_fall
+                self.ambient_rms += (level - self.ambient_rms) * alpha
+            listeners = list(self.listeners)
+
+        for listener in listeners:
+            try:
+                listener(frame, level)
+            except Exception:
+                pass
+
+    def add_listener(self, listener):
+        """Call listener(frame, rms) for every frame"""
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling a listener"""
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def begin_utterance(self, listener=None):
+        """Start recording an utterance, beginning with the pre-roll already in the ring buffer
+
+        listener(frame, rms), e.g. a streaming transcription, gets the pre-roll and then
+        every new frame until end_utterance(), with nothing missed or repeated in between.
+        """
+        with self.lock:
+            self.utterance = list(self.ring)
+            if listener:
+                for frame in self.utterance:
+                    listener(frame, None)
+                self.listeners.append(listener)
+            self.utterance_listener = listener
+
+    def end_utterance(self):
+        """Stop recording and return the utterance as sr.AudioData (None if nothing was recorded)"""
+        with self.lock:
+            frames, self.utterance = self.utterance, None
+            if self.utterance_listener in self.listeners:
+                self.listeners.remove(self.utterance_listener)
+            self.utterance_listener = None
+
+        if not frames:
+            return None
+        return sr.AudioData(b''.join(frames), self.sample_rate, 2)
+
+    def is_recording(self):
+        """Check whether an utterance is being recorded"""
+        return self.utterance is not None
+
+    def is_loud_enough(self, audio, factor=2.0, floor=0.005):
+        """Check that an utterance rises clearly above the ambient level somewhere"""
+        data = audio.get_raw_data()
+        frame_bytes = self.frame_samples * 2
+        peak = max((frame_rms(data[i:i + frame_bytes]) for i in range(0, len(data), frame_bytes)), default=0.0)
+        return peak >= max(floor, (self.ambient_rms or 0.0) * factor)
+
+    def wait_for_release(self, is_held, max_seconds=10.0):
+        """Block until is_held() turns False or max_seconds pass"""
+        start = time.time()
+        while is_held() and time.time() - start < max_seconds:
+            time.sleep(self.frame_seconds)
@@ -0,0 +1,80 @@
+﻿"""
+Pre-render Phrases - Bulk synthesize a phrase file into the TTS audio cache
+
+Usage:
+    python prerender_phrases.py phrases.txt
+    python prerender_phrases.py phrases.txt --service elevenlabs --voice "Brian" --workers 2
+
+One phrase per line; blank lines and lines starting with # are skipped.
+Service and voice default to the ones in chatbot_config.json.
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+
+
+def load_phrases(phrase_file):
+    """Read phrases from a text file, one per line"""
+    phrases = []
+    with open(phrase_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                phrases.append(line)
+    return phrases
+
+
+def main():
+    """Pre-render every phrase in the file with bounded concurrency"""
+    config = {}
+    config_file = Path('chatbot_config.json')
+    if config_file.exists():
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    parser = argparse.ArgumentParser(description="Pre-render phrases into the TTS audio cache")
+    parser.add_argument('phrase_file', help="Text file with one phrase per line")
+    parser.add_argument('--service', default=config.get('tts_service', 'streamelements'))
+    parser.add_argument('--voice', default=config.get('elevenlabs_voice', 'default'))
+    parser.add_argument('--workers', type=int, default=3, help="Concurrent synthesis requests (default 3)")
+    args = parser.parse_args()
+
+    if Path('.env').exists():
+        load_dotenv('.env')
+
+    from tts_manager import TTSManager
+
+    elevenlabs_settings = {
+        'stability': config.get('elevenlabs_stability', 0.5),
+        'similarity_boost': config.get('elevenlabs_similarity', 0.75),
+        'style': config.get('elevenlabs_style', 0.0),
+        'use_speaker_boost': config.get('elevenlabs_speaker_boost', True)
+    }
+
+    tts = TTSManager(service=args.service, voice=args.voice, elevenlabs_settings=elevenlabs_settings)
+    phrases = load_phrases(args.phrase_file)
+    todo = [phrase for phrase in phrases if not tts.is_cached(phrase)]
+
+    print(f"{len(phrases)} phrases, {len(phrases) - len(todo)} already cached, rendering {len(todo)}...")
+
+    start = time.time()
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for phrase, audio_file in zip(todo, pool.map(tts.cache_phrase, todo)):
+            if audio_file:
+                print(f"  ✅ {phrase[:60]}")
+            else:
+                print(f"  ❌ {phrase[:60]}")
+                failed.append(phrase)
+
+    print(f"Done in {time.time() - start:.1f}s ({len(todo) - len(failed)} rendered, {len(failed)} failed)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+﻿"""
+Response Cache - Reuse replies for repeated or near-identical chat messages
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+_USER_PLACEHOLDER = '\x00user\x00'
+_MIN_NAME_LENGTH = 3
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace so trivial variations match"""
+    text = re.sub(r"[^\w\s]", ' ', text.lower())
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    """Get the set of character trigrams of a normalized message"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ResponseCache:
+    def __init__(self, max_entries=500, ttl=600.0, similarity=0.8):
+        """LRU cache of replies keyed on normalized message text
+
+        Lookups that miss exactly fall back to the closest cached message by trigram
+        Jaccard similarity, if it scores at least similarity (0-1).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+
+        self.entries = OrderedDict()
+        self.index = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, message, username=None):
+        """Get a cached reply for a message, or None"""
+        key = normalize(message)
+        if not key:
+            return None
+
+        with self.lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            reply = entry['reply']
+
+        return reply.replace(_USER_PLACEHOLDER, username or 'chat')
+
+    def put(self, message, reply, username=None, ttl=None):
+        """Cache a reply; the asker's name in it is swapped for whoever asks next
+
+        Replies are not cached when the name can't be swapped safely: names too short
+        to tell apart from ordinary words, or names the message itself talks about.
+        """
+        key = normalize(message)
+        if not key or not reply:
+            return
+
+        if username:
+            pattern = r'\b' + re.escape(username) + r'\b'
+            if re.search(pattern, reply, flags=re.IGNORECASE):
+                if len(username) < _MIN_NAME_LENGTH or re.search(pattern, message, flags=re.IGNORECASE):
+                    return
+                reply = re.sub(pattern, _USER_PLACEHOLDER, reply, flags=re.IGNORECASE)
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            grams = trigrams(key)
+            self.entries[key] = {
+                'reply': reply,
+                'grams': grams,
+                'expires': time.time() + (self.ttl if ttl is None else ttl)
+            }
+            for gram in grams:
+                self.index.setdefault(gram, set()).add(key)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def _lookup(self, key):
+        """Find a live entry for a key, exactly or by similarity (lock held)"""
+        entry = self.entries.get(key)
+        if entry is None and self.similarity < 1.0:
+            key, entry = self._nearest(key)
+
+        if entry is None:
+            return None
+        if entry['expires'] < time.time():
+            self._remove(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, key):
+        """Find the most similar cached message sharing trigrams with key (lock held)"""
+        grams = trigrams(key)
+
+        # Count shared trigrams per candidate straight from the index
+        shared = {}
+        for gram in grams:
+            for candidate in self.index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        best_key, best_score = None, self.similarity
+        for candidate, overlap in shared.items():
+            score = overlap / (len(grams) + len(self.entries[candidate]['grams']) - overlap)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is None:
+            return None, None
+        return best_key, self.entries[best_key]
+
+    def _remove(self, key):
+        """Drop an entry and its index postings (lock held)"""
+        entry = self.entries.pop(key)
+        for gram in entry['grams']:
+            keys = self.index.get(gram)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.index[gram]
+
+    def clear(self):
+        """Drop every cached reply"""
+        with self.lock:
+            self.entries.clear()
+            self.index.clear()
+
+    def get_stats(self):
+        """Get entry count and hit/miss counters"""
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,39 @@
+﻿"""
+Screen OCR - Local Tesseract pass that reads text off a screenshot
+"""
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+    print("pytesseract not installed. Screen OCR disabled. Install with: pip install pytesseract")
+
+
+def read_text(image, min_word_confidence=30):
+    """Read the text on a PIL image
+
+    Returns {'text', 'confidence', 'words'}: the recognised lines, the mean word
+    confidence (0-100) and the number of words kept. Words below
+    min_word_confidence are dropped as noise (icons, textures, UI art).
+    """
+    if not TESSERACT_AVAILABLE:
+        return {'text': '', 'confidence': 0.0, 'words': 0}
+
+    data = pytesseract.image_to_data(image.convert('L'), output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        confidence = float(data['conf'][i])
+        if not word or confidence < min_word_confidence:
+            continue
+
+        line = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(line, []).append(word)
+        confidences.append(confidence)
+
+    text = '\n'.join(' '.join(words) for _, words in sorted(lines.items()))
+    confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return {'text': text, 'confidence': confidence, 'words': len(confidences)}
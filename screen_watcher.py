@@ -0,0 +1,89 @@
+﻿"""
+Screen Watcher - Samples the screen at low resolution and reports scene changes
+"""
+
+import threading
+import time
+from collections import deque
+from image_pipeline import grab, sample, sample_difference
+
+
+class ScreenWatcher:
+    def __init__(self, on_scene_change, frame_source=None, interval=0.33, sample_size=(64, 36),
+                 threshold=0.12, min_gap=60.0, max_per_hour=20):
+        """Watch for scene changes using cheap frame differencing
+
+        Each sample is shrunk to sample_size greyscale and compared with the previous
+        one; a mean absolute difference above threshold (0-1) marks a change. Once the
+        picture settles again, on_scene_change(frame) is called with the full frame,
+        at most once per min_gap seconds and max_per_hour times per rolling hour. It
+        returns True if it used the frame, which is what counts against the budget.
+        frame_source is a callable returning a PIL image (defaults to a screen grab).
+        """
+        self.on_scene_change = on_scene_change
+        self.frame_source = frame_source or grab
+        self.interval = interval
+        self.sample_size = sample_size
+        self.threshold = threshold
+        self.min_gap = min_gap
+        self.max_per_hour = max_per_hour
+
+        self.previous = None
+        self.pending_change = False
+        self.last_trigger = 0.0
+        self.triggers = deque()
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self.running = False
+
+    def _watch_loop(self):
+        """Sample, compare and trigger until stopped"""
+        while self.running:
+            started = time.time()
+            try:
+                self.process_frame(self.frame_source())
+            except Exception:
+                pass
+            time.sleep(max(0.0, self.interval - (time.time() - started)))
+
+    def process_frame(self, frame):
+        """Compare one frame with the last and trigger if a change has settled
+
+        Returns the difference score.
+        """
+        current = sample(frame, self.sample_size)
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return 0.0
+
+        score = sample_difference(current, previous)
+        if score > self.threshold:
+            # Wait for the transition to finish so the reaction sees the new scene, not a blur
+            self.pending_change = True
+        elif self.pending_change and score < self.threshold / 2:
+            self.pending_change = False
+            if self._within_budget() and self.on_scene_change(frame):
+                now = time.time()
+                self.last_trigger = now
+                self.triggers.append(now)
+
+        return score
+
+    def _within_budget(self):
+        """Check the minimum gap and the hourly limit"""
+        now = time.time()
+        while self.triggers and self.triggers[0] < now - 3600:
+            self.triggers.popleft()
+        return now - self.last_trigger >= self.min_gap and len(self.triggers) < self.max_per_hour
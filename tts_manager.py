@@ -1,5 +1,5 @@
 ﻿"""
-TTS Manager - StreamElements, ElevenLabs, and Azure TTS
+TTS Manager - StreamElements, ElevenLabs, Azure and local Piper TTS
 """
 
 import os
@@ -9,9 +9,14 @@ from pathlib import Path
 import pygame
 import threading
 import time
+import itertools
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
 from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
+from audio_stretch import time_stretch
 # Suppress console output
 if sys.platform == 'win32':
     import subprocess
@@ -63,6 +68,91 @@ except Exception:
     AudioSegment = None
 
 
+# Longest text each provider handles well in one request; longer replies are split at sentences
+CHUNK_CHAR_LIMITS = {
+    'streamelements': 250,
+    'elevenlabs': 800,
+    'azure': 1000,
+}
+
+# Voice used when a provider is reached through the failover chain rather than as the chosen service
+FALLBACK_VOICES = {
+    'streamelements': 'Brian',
+    'azure': 'en-US-JennyNeural',
+    'piper': 'en_US-lessac-medium',
+    'elevenlabs': None,
+}
+
+# Providers that bill per character; nothing is synthesized on them unless the user asked for it
+PAID_PROVIDERS = {'elevenlabs', 'azure'}
+
+PROVIDER_TIMEOUTS = {
+    'streamelements': 15,
+    'elevenlabs': 20,
+    'azure': 20,
+    'piper': 30,
+}
+
+
+class ProviderHealth:
+    def __init__(self, window=20, failure_threshold=3, cooloff=30.0):
+        """Rolling latency/error stats and a circuit breaker for one TTS provider"""
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooloff = cooloff
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def record_success(self, latency):
+        """Record a successful request and close the circuit"""
+        with self.lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        """Record a failed or timed-out request, opening the circuit after repeated failures"""
+        with self.lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.open_until = time.time() + self.cooloff
+
+    def is_available(self):
+        """Check the circuit; after the cool-off one trial request is let through"""
+        with self.lock:
+            return time.time() >= self.open_until
+
+    def p95(self):
+        """Get the 95th percentile latency, or None with too few samples"""
+        with self.lock:
+            if len(self.latencies) < 5:
+                return None
+            return float(np.percentile(list(self.latencies), 95))
+
+    def error_rate(self):
+        """Get the share of recent requests that failed"""
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def summary(self):
+        """Get a snapshot of this provider's health"""
+        with self.lock:
+            latencies = list(self.latencies)
+            circuit_open = time.time() < self.open_until
+        return {
+            'p50': float(np.median(latencies)) if latencies else None,
+            'p95': self.p95(),
+            'error_rate': self.error_rate(),
+            'circuit_open': circuit_open,
+        }
+
+
 class TTSManager:
     def __init__(self, service='elevenlabs', voice='default', elevenlabs_settings=None):
         """Initialize TTS manager - StreamElements, ElevenLabs, and Azure"""
@@ -71,6 +161,32 @@ class TTSManager:
         self.audio_folder = Path('audio_cache')
         self.audio_folder.mkdir(exist_ok=True)
 
+        # Cached clips keyed by service, voice and text: "username said" prefixes
+        # reused across replies to the same chatter, and pre-rendered phrases
+        self.name_clip_folder = self.audio_folder / 'names'
+        self.phrase_folder = self.audio_folder / 'phrases'
+        self.name_clips = self._load_clip_index(self.name_clip_folder)
+        self.phrase_clips = self._load_clip_index(self.phrase_folder)
+        self.cache_lock = threading.Lock()
+        self.file_counter = itertools.count()
+
+        # Joined clips made for a single playback; deleted once they have played
+        self.one_off_files = set()
+
+        # Chunked synthesis for long replies
+        self.synthesis_workers = 3
+        self.streamelements_url = "https://api.streamelements.com/kappa/v2/speech"
+
+        # Provider failover: tried in order, skipping providers whose circuit is open
+        self.failover_chain = [service]
+        self.fallback_voices = dict(FALLBACK_VOICES)
+        self.provider_timeouts = dict(PROVIDER_TIMEOUTS)
+        self.provider_health = {}
+        self.hedge_requests = False
+        self.provider_pool = ThreadPoolExecutor(max_workers=6)
+        self.piper_models_folder = Path('piper_models')
+        self.piper_executable = 'piper'
+
         self.elevenlabs_settings = elevenlabs_settings or {
             'stability': 0.5,
             'similarity_boost': 0.75,
@@ -95,6 +211,13 @@ class TTSManager:
         self.monitoring_thread = None
         self.stop_monitoring = False
 
+        # Playback timeline for microphone echo handling: when the current clip started,
+        # when the last one ended and (with echo_reference on) its 16 kHz mono samples
+        self.playback_started = None
+        self.playback_ended = 0.0
+        self.playback_reference = None
+        self.echo_reference = False
+
         # Volume detection settings
         self.volume_threshold = 0.01
         self.min_speech_duration = 0.05
@@ -111,17 +234,41 @@ class TTSManager:
         self.on_audio_silent = None
         self.on_audio_end = None
 
+        self.elevenlabs_client = None
+        self.azure_speech_config = None
+        self._init_provider(service)
+
+    def _init_provider(self, name):
+        """Create the client a provider needs, if it hasn't been created yet"""
         # Initialize ElevenLabs client
-        if service == 'elevenlabs':
+        if name == 'elevenlabs' and not self.elevenlabs_client:
             api_key = os.getenv('ELEVENLABS_API_KEY')
             if api_key:
-                self.elevenlabs_client = ElevenLabs(api_key=api_key)
+                self.elevenlabs_client = ElevenLabs(api_key=api_key,
+                                                    timeout=self.provider_timeouts.get('elevenlabs', 20))
 
         # Initialize Azure Speech client
-        if service == 'azure':
-            self.azure_speech_config = None
+        if name == 'azure' and not self.azure_speech_config:
             self.init_azure_client()
 
+    def set_failover_chain(self, chain, fallback_voices=None, hedge_requests=False):
+        """Set the providers to try in order, e.g. ['elevenlabs', 'azure', 'streamelements', 'piper']
+
+        The configured service always goes first. With hedge_requests, a backup request
+        is fired at the next provider when the current one runs past its p95 latency.
+        """
+        self.failover_chain = [self.service] + [name for name in chain if name != self.service]
+        if fallback_voices:
+            self.fallback_voices.update(fallback_voices)
+        self.hedge_requests = hedge_requests
+
+        for name in self.failover_chain:
+            self._init_provider(name)
+
+    def get_provider_health(self):
+        """Get latency, error rate and circuit state for each provider used so far"""
+        return {name: health.summary() for name, health in self.provider_health.items()}
+
     def init_azure_client(self):
         """Initialize Azure Speech SDK"""
         try:
@@ -162,36 +309,364 @@ class TTSManager:
         if not text.strip():
             return
 
+        try:
+            # Long text starts playing as soon as its first chunk is ready
+            for audio_file in self.synthesize_stream(text):
+                self.play(audio_file, callback_on_start, callback_on_end)
+
+        except Exception as e:
+            print(f"[TTS] Error in speak: {e}")
+            if callback_on_end:
+                callback_on_end()
+
+    def synthesize(self, text):
+        """Generate an audio file for text without playing it (pre-rendered phrases come from the cache)"""
         # Clean text: remove content in parentheses
         text = self._clean_text_for_tts(text)
+        if not text:
+            return None
+
+        audio_files = list(self.synthesize_stream(text))
+        if len(audio_files) > 1:
+            return self.concat_audio(audio_files, gap=0)
+        return audio_files[0] if audio_files else None
+
+    def synthesize_stream(self, text):
+        """Yield audio files for text in order, synthesizing sentence chunks concurrently
+
+        Text over the provider's chunk limit is split at sentence boundaries and the
+        chunks are requested in parallel (up to synthesis_workers at a time); each is
+        yielded as soon as it and everything before it is ready. A chunk that fails is
+        retried once; if it still fails the rest of the reply is dropped rather than
+        played with a sentence missing.
+        """
+        text = self._clean_text_for_tts(text)
+        if not text:
+            return
+
+        with self.cache_lock:
+            cached = self.phrase_clips.get(self._cache_key(text))
+        if cached and cached.exists():
+            yield cached
+            return
 
-        audio_file = None
+        chunks = self._split_text(text, CHUNK_CHAR_LIMITS.get(self.service, 500))
+        if len(chunks) == 1:
+            audio_file = self._synthesize_uncached(text)
+            if audio_file:
+                yield audio_file
+            return
+
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.synthesis_workers, len(chunks))))
         try:
-            if self.service == 'elevenlabs':
-                audio_file = self._elevenlabs_tts(text)
-            elif self.service == 'streamelements':
-                audio_file = self._streamelements_tts(text)
-            elif self.service == 'azure':
-                audio_file = self._azure_tts(text)
+            futures = [pool.submit(self._synthesize_uncached, chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                audio_file = future.result() or self._synthesize_uncached(chunk)
+                if not audio_file:
+                    print(f"[TTS] Could not synthesize \"{chunk[:60]}\", dropping the rest of the reply")
+                    return
+                yield audio_file
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _split_text(self, text, limit):
+        """Split text into chunks of at most limit characters, preferring sentence boundaries"""
+        if len(text) <= limit:
+            return [text]
+
+        pieces = []
+        for sentence in re.split(r'(?<=[.!?])\s+', text):
+            # Break overlong sentences at commas, then at spaces
+            while len(sentence) > limit:
+                cut = sentence.rfind(', ', 0, limit)
+                if cut <= 0:
+                    cut = sentence.rfind(' ', 0, limit)
+                if cut <= 0:
+                    cut = limit - 1
+                pieces.append(sentence[:cut + 1].strip())
+                sentence = sentence[cut + 1:].strip()
+            if sentence:
+                pieces.append(sentence)
+
+        chunks = []
+        current = ''
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
             else:
-                return
+                current = f"{current} {piece}".strip()
+        if current:
+            chunks.append(current)
+
+        return chunks
+
+    def _synthesize_uncached(self, text, primary_only=False):
+        """Generate an audio file for text, failing over along the provider chain"""
+        chain = [self.service] if primary_only else self.failover_chain
+
+        # Open circuits go to the back rather than out, so a fully tripped chain
+        # still gets a half-open probe instead of dropping the reply
+        candidates = sorted(chain, key=lambda name: not self._health(name).is_available())
+
+        while candidates:
+            name = candidates.pop(0)
+            started = {}
+            future = self.provider_pool.submit(self._timed_provider_tts, name, text, started)
+            pending = {future: name}
+
+            # Hedge: if this provider is slower than usual, race the next one against it
+            hedge_after = self._health(name).p95() if self.hedge_requests and candidates else None
+            if hedge_after is not None:
+                done, _ = wait([future], timeout=hedge_after)
+                if not done:
+                    backup = candidates.pop(0)
+                    print(f"[TTS] {name} slower than p95 ({hedge_after:.1f}s), hedging with {backup}")
+                    pending[self.provider_pool.submit(self._timed_provider_tts, backup, text, started)] = backup
+
+            while pending:
+                # Each timeout runs from when the job got a worker, not while it was queued; the
+                # grace second lets the provider's own timeout fire first and report the failure
+                now = time.time()
+                deadline = max(started.get(n, now) + self.provider_timeouts.get(n, 20) + 1.0 for n in pending.values())
+                done, _ = wait(list(pending), timeout=max(0.0, deadline - now), return_when=FIRST_COMPLETED)
+                if not done:
+                    if any(n not in started for n in pending.values()):
+                        continue
+                    for timed_out in pending.values():
+                        print(f"[TTS] {timed_out} timed out")
+                        self._health(timed_out).record_failure()
+                    break
+
+                for finished in done:
+                    provider = pending.pop(finished)
+                    audio_file = finished.result()
+                    if audio_file:
+                        return audio_file
+                    print(f"[TTS] {provider} failed")
+
+        return None
+
+    def _health(self, name):
+        """Get (or create) the health tracker for a provider"""
+        with self.cache_lock:
+            if name not in self.provider_health:
+                self.provider_health[name] = ProviderHealth()
+            return self.provider_health[name]
+
+    def _timed_provider_tts(self, name, text, started=None):
+        """Call one provider and record its latency or failure (and its start time in started)"""
+        start = time.time()
+        if started is not None:
+            started[name] = start
+        try:
+            audio_file = self._provider_tts(name, text)
+        except Exception:
+            audio_file = None
 
-            if audio_file and audio_file.exists():
-                if callback_on_start:
-                    callback_on_start()
+        elapsed = time.time() - start
+        if audio_file and audio_file.exists():
+            # A late answer was already counted as a timeout by the caller
+            if elapsed <= self.provider_timeouts.get(name, 20):
+                self._health(name).record_success(elapsed)
+            return audio_file
 
-                self._analyze_audio_file(audio_file)
-                self._play_audio_with_volume_monitoring(audio_file)
+        self._health(name).record_failure()
+        return None
+
+    def _provider_tts(self, name, text):
+        """Synthesize with a specific provider, using its fallback voice unless it is the chosen service"""
+        voice = self.voice if name == self.service else self.fallback_voices.get(name)
+
+        if name == 'elevenlabs':
+            return self._elevenlabs_tts(text, voice) if voice else None
+        elif name == 'streamelements':
+            return self._streamelements_tts(text, voice)
+        elif name == 'azure':
+            return self._azure_tts(text, voice)
+        elif name == 'piper':
+            return self._piper_tts(text, voice)
+        return None
+
+    def _cache_key(self, text):
+        """Build a filesystem-safe cache key for text in the current service and voice"""
+        import hashlib
+        parts = [self.service, self.voice, text.lower()]
+        key = '_'.join(re.sub(r'[^\w-]+', '-', part).strip('-') for part in parts)
+
+        # Keep long phrases under filename limits while staying unique
+        if len(key) > 120:
+            key = key[:100] + '-' + hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12]
+        return key
+
+    def _new_audio_path(self, prefix, extension):
+        """Get a unique file path in the audio cache (safe when synthesizing concurrently)"""
+        timestamp = str(int(time.time() * 1000))
+        return self.audio_folder / f'{prefix}_{timestamp}_{next(self.file_counter)}.{extension}'
+
+    def _load_clip_index(self, folder):
+        """Index the cached clips already on disk by cache key"""
+        folder.mkdir(exist_ok=True)
+        return {path.stem: path for path in folder.iterdir() if path.is_file()}
+
+    def _get_cached_clip(self, text, folder, index, primary_only=False):
+        """Get the clip for text from a cache folder, synthesizing and storing it on a miss"""
+        key = self._cache_key(text)
+
+        with self.cache_lock:
+            cached = index.get(key)
+            if cached and cached.exists():
+                return cached
+
+        # Only the chosen voice goes into the cache; a failover voice is used once and not kept
+        audio_file = self._synthesize_uncached(text, primary_only=True)
+        if not audio_file:
+            return None if primary_only else self._synthesize_uncached(text)
+
+        cached = audio_file.replace(folder / f'{key}{audio_file.suffix}')
+        with self.cache_lock:
+            index[key] = cached
+        return cached
+
+    def get_name_clip(self, prefix):
+        """Get the audio for a read-back prefix like "alice said", synthesizing it only once per voice"""
+        return self._get_cached_clip(prefix, self.name_clip_folder, self.name_clips)
+
+    def cache_phrase(self, text):
+        """Pre-render a phrase into the cache so later synthesize() calls for it are instant
+
+        Only the chosen voice is cached, so this returns None if that service fails.
+        """
+        return self._get_cached_clip(self._clean_text_for_tts(text), self.phrase_folder, self.phrase_clips,
+                                     primary_only=True)
+
+    def prewarm(self, text, name_clip=False):
+        """Cache a phrase (or name clip) ahead of time with the chosen voice only
+
+        A failover voice isn't kept in the cache, so warming through one would only
+        spend requests. Returns None if the chosen service couldn't make the clip.
+        """
+        if name_clip:
+            return self._get_cached_clip(text, self.name_clip_folder, self.name_clips, primary_only=True)
+        return self.cache_phrase(text)
+
+    def is_cached(self, text, name_clip=False):
+        """Check whether a phrase (or name clip) is already in the cache"""
+        if name_clip:
+            key, index = self._cache_key(text), self.name_clips
+        else:
+            key, index = self._cache_key(self._clean_text_for_tts(text)), self.phrase_clips
+
+        with self.cache_lock:
+            cached = index.get(key)
+        return bool(cached and cached.exists())
+
+    def concat_audio(self, audio_files, gap=0.08):
+        """Join audio files into one WAV with a short gap between them"""
+        pieces = []
+        target_rate = None
+        channels = 1
+
+        for audio_file in audio_files:
+            samples, sample_rate = self._load_pcm(audio_file)
+            if samples is None:
+                return None
 
-                if callback_on_end:
-                    callback_on_end()
+            if target_rate is None:
+                target_rate = sample_rate
+            elif sample_rate != target_rate:
+                # Linear resample; name clips and replies come from the same voice so this is rare
+                positions = np.linspace(0, len(samples) - 1, int(len(samples) * target_rate / sample_rate))
+                if samples.ndim == 1:
+                    samples = np.interp(positions, np.arange(len(samples)), samples)
+                else:
+                    samples = np.stack([np.interp(positions, np.arange(len(samples)), samples[:, c])
+                                        for c in range(samples.shape[1])], axis=1)
+
+            if samples.ndim > 1:
+                channels = max(channels, samples.shape[1])
+            pieces.append(samples)
+
+        silence = np.zeros(int(target_rate * gap))
+        joined = []
+        for i, samples in enumerate(pieces):
+            if channels > 1 and samples.ndim == 1:
+                samples = np.repeat(samples[:, None], channels, axis=1)
+            if i > 0 and len(silence):
+                joined.append(silence if channels == 1 else np.zeros((len(silence), channels)))
+            joined.append(samples)
+
+        joined_file = self._write_wav(np.concatenate(joined), target_rate, self._new_audio_path('joined', 'wav'))
+        if joined_file:
+            with self.cache_lock:
+                self.one_off_files.add(joined_file)
+        return joined_file
+
+    def synthesize_with_prefix(self, prefix, text):
+        """Synthesize text behind a cached prefix clip (only text is sent to the provider)
+
+        Returns the audio files to play in order: one joined clip, or the prefix and
+        the text's clips separately when they can't be joined (e.g. no MP3 decoder).
+        """
+        prefix_clip = self.get_name_clip(prefix) if prefix else None
+        audio_files = list(self.synthesize_stream(text)) if text and text.strip() else []
+        clips = ([prefix_clip] if prefix_clip else []) + audio_files
+
+        if len(clips) > 1:
+            try:
+                joined = self.concat_audio(clips)
+            except Exception:
+                joined = None
+            if joined:
+                return [joined]
+        return clips
 
-        except Exception as e:
-            print(f"[TTS] Error in speak: {e}")
-            if callback_on_end:
-                callback_on_end()
+    def play(self, audio_file, callback_on_start=None, callback_on_end=None, speed=1.0):
+        """Play a synthesized audio file with audio-reactive monitoring
+
+        A speed above 1.0 plays a time-stretched copy (same pitch, shorter duration),
+        which is deleted after playback, as are joined one-off clips.
+        """
+        original_file = audio_file
+        stretched_file = self._stretch_audio_file(audio_file, speed) if speed > 1.0 else None
+        if stretched_file:
+            audio_file = stretched_file
+
+        if callback_on_start:
+            callback_on_start()
+
+        self._analyze_audio_file(audio_file)
+
+        self.playback_reference = None
+        if self.echo_reference:
+            self.playback_reference = self._reference_pcm(audio_file)
+
+        self._play_audio_with_volume_monitoring(audio_file)
+
+        if stretched_file:
+            self._discard_audio_file(stretched_file)
 
-    def _azure_tts(self, text):
+        with self.cache_lock:
+            one_off = original_file in self.one_off_files
+            self.one_off_files.discard(original_file)
+        if one_off:
+            self._discard_audio_file(original_file)
+
+        if callback_on_end:
+            callback_on_end()
+
+    def _discard_audio_file(self, audio_file):
+        """Delete a one-off audio file once the mixer has let go of it"""
+        try:
+            pygame.mixer.music.unload()
+        except Exception:
+            pass
+        try:
+            audio_file.unlink()
+        except Exception:
+            pass
+
+    def _azure_tts(self, text, voice=None):
         """Generate speech using Azure Neural TTS"""
         try:
             import azure.cognitiveservices.speech as speechsdk
@@ -203,7 +678,7 @@ class TTSManager:
             # Extract voice name - CRITICAL FIX
             # Input format: "en-US-JennyNeural (Female, Friendly)"
             # We need: "en-US-JennyNeural"
-            voice_name = self.voice
+            voice_name = voice or self.voice
 
             print(f"[TTS] Azure raw voice input: {voice_name}")
 
@@ -221,8 +696,7 @@ class TTSManager:
             self.azure_speech_config.speech_synthesis_voice_name = voice_name
 
             # Set output to WAV file
-            timestamp = str(int(time.time() * 1000))
-            audio_file = self.audio_folder / f'azure_{timestamp}.wav'
+            audio_file = self._new_audio_path('azure', 'wav')
 
             audio_config = speechsdk.audio.AudioOutputConfig(filename=str(audio_file))
 
@@ -232,9 +706,18 @@ class TTSManager:
                 audio_config=audio_config
             )
 
-            # Synthesize
+            # Synthesize; the SDK's result future has no timeout, so wait on its events instead
             print(f"[TTS] Azure synthesizing with voice: {voice_name}")
-            result = synthesizer.speak_text_async(text).get()
+            finished = threading.Event()
+            synthesizer.synthesis_completed.connect(lambda evt: finished.set())
+            synthesizer.synthesis_canceled.connect(lambda evt: finished.set())
+            future = synthesizer.speak_text_async(text)
+
+            if not finished.wait(self.provider_timeouts.get('azure', 20)):
+                synthesizer.stop_speaking_async()
+                print("[TTS] ❌ Azure synthesis timed out")
+                return None
+            result = future.get()
 
             # Check result
             if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
@@ -259,35 +742,84 @@ class TTSManager:
             traceback.print_exc()
             return None
 
+    def _load_pcm(self, audio_file):
+        """Decode an audio file to float samples in -1..1, shaped (n,) or (n, channels)"""
+        if audio_file.suffix == '.mp3':
+            if AudioSegment is None:
+                return None, None
+            audio = AudioSegment.from_mp3(str(audio_file))
+            samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+            sample_rate = audio.frame_rate
+            if audio.channels > 1:
+                samples = samples.reshape(-1, audio.channels)
+            if audio.sample_width == 2:
+                samples = samples / 32768.0
+            elif audio.sample_width == 1:
+                samples = samples / 128.0
+        else:
+            from scipy.io import wavfile
+            sample_rate, samples = wavfile.read(str(audio_file))
+            if samples.dtype == np.int16:
+                samples = samples / 32768.0
+            elif samples.dtype == np.int8:
+                samples = samples / 128.0
+
+        return samples, sample_rate
+
+    def _reference_pcm(self, audio_file, sample_rate=16000):
+        """Decode a clip to mono float samples at the microphone's rate, for echo cancellation"""
+        try:
+            samples, source_rate = self._load_pcm(audio_file)
+            if samples is None:
+                return None
+            if samples.ndim > 1:
+                samples = samples.mean(axis=1)
+
+            duration = len(samples) / source_rate
+            positions = np.arange(int(duration * sample_rate)) * (source_rate / sample_rate)
+            return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        except Exception:
+            return None
+
+    def get_playback_timeline(self):
+        """Get (started, ended, reference) for the bot's audio output
+
+        While a clip plays, started is its start time and ended is from the previous
+        clip; reference is the playing clip at 16 kHz mono (None unless echo_reference).
+        """
+        return self.playback_started, self.playback_ended, self.playback_reference
+
+    def _write_wav(self, samples, sample_rate, audio_file):
+        """Write float samples in -1..1 to a 16-bit WAV file"""
+        from scipy.io import wavfile
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        wavfile.write(str(audio_file), sample_rate, pcm)
+        return audio_file
+
+    def _stretch_audio_file(self, audio_file, speed):
+        """Write a pitch-preserving sped-up copy of an audio file"""
+        try:
+            samples, sample_rate = self._load_pcm(audio_file)
+            if samples is None:
+                return None
+
+            stretched = time_stretch(samples, sample_rate, speed)
+            stretched_file = self.audio_folder / f'{audio_file.stem}_x{speed:.2f}.wav'
+            return self._write_wav(stretched, sample_rate, stretched_file)
+        except Exception:
+            return None
+
     def _analyze_audio_file(self, audio_file):
         """Analyze audio file to extract volume envelope"""
         try:
-            if audio_file.suffix == '.mp3':
-                try:
-                    if AudioSegment is None:
-                        self.audio_data = None
-                        return
-                    audio = AudioSegment.from_mp3(str(audio_file))
-                    samples = np.array(audio.get_array_of_samples())
-                    sample_rate = audio.frame_rate
-                    if audio.sample_width == 2:
-                        samples = samples / 32768.0
-                    elif audio.sample_width == 1:
-                        samples = samples / 128.0
-                except Exception:
-                    self.audio_data = None
-                    return
-            else:
-                try:
-                    from scipy.io import wavfile
-                    sample_rate, samples = wavfile.read(str(audio_file))
-                    if samples.dtype == np.int16:
-                        samples = samples / 32768.0
-                    elif samples.dtype == np.int8:
-                        samples = samples / 128.0
-                except Exception:
-                    self.audio_data = None
-                    return
+            try:
+                samples, sample_rate = self._load_pcm(audio_file)
+            except Exception:
+                samples = None
+
+            if samples is None:
+                self.audio_data = None
+                return
 
             if len(samples.shape) > 1:
                 samples = np.mean(samples, axis=1)
@@ -316,6 +848,7 @@ class TTSManager:
             pygame.mixer.music.load(str(audio_file))
             pygame.mixer.music.play()
 
+            self.playback_started = time.time()
             self.is_playing = True
             self.audio_active = False
             self.volume_history = []
@@ -333,6 +866,7 @@ class TTSManager:
             while pygame.mixer.music.get_busy():
                 pygame.time.Clock().tick(100)
 
+            self.playback_ended = time.time()
             self.stop_monitoring = True
             if self.monitoring_thread:
                 self.monitoring_thread.join(timeout=0.5)
@@ -344,6 +878,7 @@ class TTSManager:
                 self.on_audio_end()
 
         except Exception:
+            self.playback_ended = time.time()
             self.is_playing = False
             self.audio_active = False
 
@@ -408,10 +943,10 @@ class TTSManager:
         self.on_audio_silent = on_silent
         self.on_audio_end = on_end
 
-    def _elevenlabs_tts(self, text):
+    def _elevenlabs_tts(self, text, voice=None):
         """Generate speech using ElevenLabs"""
         try:
-            voice_id = self.voice
+            voice_id = voice or self.voice
             if '(' in voice_id and ')' in voice_id:
                 voice_id = voice_id.split('(')[1].split(')')[0]
 
@@ -428,8 +963,7 @@ class TTSManager:
                 )
             )
 
-            timestamp = str(int(time.time() * 1000))
-            audio_file = self.audio_folder / f'elevenlabs_{timestamp}.mp3'
+            audio_file = self._new_audio_path('elevenlabs', 'mp3')
 
             with open(audio_file, 'wb') as f:
                 for chunk in audio_generator:
@@ -439,19 +973,19 @@ class TTSManager:
         except Exception:
             return None
 
-    def _streamelements_tts(self, text):
+    def _streamelements_tts(self, text, voice=None):
         """Generate speech using StreamElements (Free!)"""
         try:
-            voice_name = self.voice if self.voice != 'default' else 'Brian'
-            url = "https://api.streamelements.com/kappa/v2/speech"
+            voice = voice or self.voice
+            voice_name = voice if voice != 'default' else 'Brian'
             params = {'voice': voice_name, 'text': text}
 
-            response = requests.get(url, params=params, timeout=15)
+            response = requests.get(self.streamelements_url, params=params,
+                                    timeout=self.provider_timeouts.get('streamelements', 15))
             if response.status_code != 200:
                 return None
 
-            timestamp = str(int(time.time() * 1000))
-            audio_file = self.audio_folder / f'streamelements_{timestamp}.mp3'
+            audio_file = self._new_audio_path('streamelements', 'mp3')
 
             with open(audio_file, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=1024):
@@ -467,6 +1001,37 @@ class TTSManager:
         except Exception:
             return None
 
+    def _piper_tts(self, text, voice=None):
+        """Generate speech locally with the Piper CLI and a model from piper_models/"""
+        try:
+            import subprocess
+
+            model_name = voice if voice and voice != 'default' else FALLBACK_VOICES['piper']
+            model_path = self.piper_models_folder / f'{model_name}.onnx'
+            if not model_path.exists():
+                print(f"[TTS] Piper model not found: {model_path}")
+                return None
+
+            audio_file = self._new_audio_path('piper', 'wav')
+            subprocess.run(
+                [self.piper_executable, '--model', str(model_path), '--output_file', str(audio_file)],
+                input=text.encode('utf-8'),
+                capture_output=True,
+                timeout=self.provider_timeouts.get('piper', 30),
+                check=True
+            )
+
+            if audio_file.exists() and audio_file.stat().st_size > 1000:
+                return audio_file
+            return None
+
+        except FileNotFoundError:
+            print("[TTS] Piper not installed. Run: pip install piper-tts")
+            return None
+        except Exception as e:
+            print(f"[TTS] Piper TTS error: {e}")
+            return None
+
     def stop(self):
         """Stop current audio playback"""
         try:
@@ -0,0 +1,91 @@
+﻿"""
+Voice Activity - Speech start/end detection on live microphone frames
+"""
+
+from collections import deque
+
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate=16000, frame_seconds=0.03, aggressiveness=2, start_frames=3,
+                 hangover=0.5, min_speech=0.25, max_utterance=15.0, preroll=0.3, ambient=None):
+        """Cut the frame stream into utterances
+
+        Each frame is classed as speech by WebRTC VAD (aggressiveness 0-3) when it's
+        installed, else by energy against the ambient level (ambient is a callable
+        returning the current ambient RMS). Speech starts after start_frames speech
+        frames in a row and ends after hangover seconds without speech; utterances
+        shorter than min_speech seconds are dropped as noise.
+        """
+        self.sample_rate = sample_rate
+        self.frame_seconds = frame_seconds
+        self.start_frames = start_frames
+        self.hangover_frames = max(1, int(hangover / frame_seconds))
+        self.min_speech_frames = max(1, int(min_speech / frame_seconds))
+        self.max_frames = int(max_utterance / frame_seconds)
+        self.ambient = ambient
+
+        self.vad = webrtcvad.Vad(aggressiveness) if WEBRTCVAD_AVAILABLE else None
+
+        self.preroll = deque(maxlen=max(start_frames, int(preroll / frame_seconds)))
+        self.frames = None
+        self.speech_run = 0
+        self.speech_frames = 0
+        self.silence_run = 0
+
+    def is_speech(self, frame, level):
+        """Classify one frame"""
+        if self.vad:
+            try:
+                return self.vad.is_speech(frame, self.sample_rate)
+            except Exception:
+                pass
+
+        ambient = self.ambient() if self.ambient else None
+        return level > max(0.01, (ambient or 0.0) * 3)
+
+    def process(self, frame, level):
+        """Feed one frame; returns the utterance's PCM bytes when one ends, else None"""
+        speech = self.is_speech(frame, level)
+
+        if self.frames is None:
+            self.preroll.append(frame)
+            self.speech_run = self.speech_run + 1 if speech else 0
+            if self.speech_run >= self.start_frames:
+                self.frames = list(self.preroll)
+                self.speech_frames = self.speech_run
+                self.silence_run = 0
+            return None
+
+        self.frames.append(frame)
+        if speech:
+            self.speech_frames += 1
+            self.silence_run = 0
+        else:
+            self.silence_run += 1
+
+        if self.silence_run < self.hangover_frames and len(self.frames) < self.max_frames:
+            return None
+
+        frames, self.frames = self.frames, None
+        self.preroll.clear()
+        self.speech_run = 0
+
+        if self.speech_frames < self.min_speech_frames:
+            return None
+
+        # Trim the trailing hangover silence
+        if self.silence_run:
+            frames = frames[:len(frames) - self.silence_run + 1]
+        return b''.join(frames)
+
+    def reset(self):
+        """Drop any utterance in progress"""
+        self.frames = None
+        self.preroll.clear()
+        self.speech_run = 0